@@ -0,0 +1,21 @@
+"""Benchmarks for the load, transform, filter and plot stages of every week page.
+
+The stages run outside Streamlit, with the page's caches bypassed, against
+local fixture files scaled from the real datasets::
+
+    python -m benchmarks run --scales 1 10 100 --output before.json
+    python -m benchmarks run --scales 1 10 100 --output after.json
+    python -m benchmarks compare before.json after.json
+
+Synthetic inputs of any size, with no network access::
+
+    python -m benchmarks generate superstore_orders orders.parquet --rows 5000000
+    python -m benchmarks run --source superstore_orders=orders.parquet
+
+The aggregation engines, LTTB downsampling and the bounded cache's eviction
+agree with their references on synthetic data::
+
+    python -m benchmarks check
+
+See ``python -m benchmarks --help`` for the options.
+"""
@@ -0,0 +1,115 @@
+import argparse
+import datetime
+import inspect
+import sys
+import time
+from pathlib import Path
+
+import common.snapshot
+from benchmarks.checks import CHECKS, Skipped, run_checks
+from benchmarks.runner import compare, read_results, run, write_results
+from benchmarks.synthetic import GENERATORS, write_tables
+
+
+def parse_source(value: str) -> tuple[str, str]:
+    dataset, sep, source = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected DATASET=PATH, got {value!r}")
+    return dataset, source
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="benchmark the page pipelines")
+    run_parser.add_argument(
+        "--scales", type=int, nargs="+", default=[1, 10, 100], metavar="N"
+    )
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument(
+        "--pages", nargs="+", metavar="NAME", help="e.g. week_15 or 2025/week_16"
+    )
+    run_parser.add_argument(
+        "--source",
+        type=parse_source,
+        action="append",
+        default=[],
+        metavar="DATASET=PATH",
+        help="base data for a dataset instead of the page's DATA_SOURCE",
+    )
+    run_parser.add_argument(
+        "--workdir", type=Path, default=common.snapshot.CACHE_DIR / "bench"
+    )
+    run_parser.add_argument("--output", type=Path)
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("base", type=Path)
+    compare_parser.add_argument("new", type=Path)
+
+    generate_parser = commands.add_parser(
+        "generate", help="write a synthetic dataset to CSV or Parquet"
+    )
+    generate_parser.add_argument("dataset", choices=sorted(GENERATORS))
+    generate_parser.add_argument("output", type=Path, help="*.csv or *.parquet")
+    generate_parser.add_argument("--seed", type=int, default=0)
+    generate_parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    generate_parser.add_argument("--years", type=int)
+    generate_parser.add_argument("--first-year", type=int)
+    orders = generate_parser.add_argument_group("superstore_orders")
+    orders.add_argument("--rows", type=int, default=1_000_000)
+    orders.add_argument("--states", type=int)
+    orders.add_argument("--sub-categories", type=int)
+    orders.add_argument("--customers", type=int)
+    orders.add_argument("--products", type=int, help="per sub-category")
+    orders.add_argument("--cities", type=int, help="per state")
+    population = generate_parser.add_argument_group("eu27_population")
+    population.add_argument("--countries", type=int)
+
+    check_parser = commands.add_parser(
+        "check", help="check that interchangeable implementations agree"
+    )
+    check_parser.add_argument(
+        "--checks", nargs="+", choices=sorted(CHECKS), metavar="NAME"
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run(
+            args.scales, args.repeat, args.workdir, args.pages, dict(args.source)
+        )
+        output = args.output or args.workdir / (
+            f"results-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+        )
+        write_results(results, output)
+        print(f"results written to {output}")
+    elif args.command == "generate":
+        generator = GENERATORS[args.dataset]
+        options = {
+            name: getattr(args, name)
+            for name in inspect.signature(generator).parameters
+            if getattr(args, name, None) is not None
+        }
+        start = time.perf_counter()
+        rows = write_tables(generator(**options), args.output)
+        print(
+            f"{rows:,} rows written to {args.output} "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+    elif args.command == "check":
+        failed = False
+        for name, differences in run_checks(args.checks).items():
+            failures = [item for item in differences if not isinstance(item, Skipped)]
+            print(f"{name}: {'FAILED' if failures else 'ok'}")
+            for difference in differences:
+                prefix = "skipped: " if isinstance(difference, Skipped) else ""
+                print(f"  {prefix}{difference}")
+            failed = failed or bool(failures)
+        sys.exit(1 if failed else 0)
+    else:
+        print("\n".join(compare(read_results(args.base), read_results(args.new))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""Checks that interchangeable implementations behind the pages agree.
+
+Each check runs on seeded synthetic data and returns the differences it
+found, so a divergence shows up here rather than as a wrong chart. Parts that
+cannot run here, such as an optional engine that is not installed, are
+returned as ``Skipped`` notes, which do not fail the check::
+
+    python -m benchmarks check
+    python -m benchmarks check --checks engines
+"""
+
+import heapq
+import json
+import logging
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import common.charts
+import common.snapshot
+from benchmarks.synthetic import order_tables, write_tables
+from common.aggregate import ENGINES, FUNCTIONS, Aggregation, aggregate
+from common.cache import AGGREGATE, FIGURE, BoundedCache, payload_bytes
+from common.downsample import lttb_indices
+from common.snapshot import (
+    SnapshotUnavailable,
+    SourceChunks,
+    read_snapshot,
+    snapshot_fingerprint,
+)
+from common.superstore import CUBE_KEYS, MEASURE_SUMS, OrderCube, normalize_orders
+
+# Relative tolerance of float results; engines sum in different orders.
+RTOL = 1e-9
+
+
+class Skipped(str):
+    """A note that part of a check did not run; not a difference."""
+
+
+def synthetic_orders(rows: int = 20_000, seed: int = 0) -> pd.DataFrame:
+    table = pa.concat_tables(order_tables(rows, seed=seed, chunk_rows=rows))
+    data_df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    return normalize_orders(
+        data_df.assign(**{"Order Date": data_df["Order Date"].astype("datetime64[ns]")})
+    )
+
+
+def frame_differences(name: str, expected: pd.DataFrame, actual: pd.DataFrame):
+    """Compare two aggregation results by value, not by dtype."""
+    expected = expected.reset_index()
+    actual = actual.reset_index()
+    if list(expected.columns) != list(actual.columns):
+        return [f"{name}: columns {list(actual.columns)} != {list(expected.columns)}"]
+    if len(expected) != len(actual):
+        return [f"{name}: {len(actual)} rows != {len(expected)}"]
+
+    differences = []
+    for column in expected.columns:
+        want = expected[column].to_numpy(dtype=object)
+        got = actual[column].to_numpy(dtype=object)
+        if pd.api.types.is_numeric_dtype(expected[column]) and column not in CUBE_KEYS:
+            same = np.isclose(
+                want.astype(np.float64), got.astype(np.float64), rtol=RTOL
+            )
+        else:
+            same = np.array([str(a) == str(b) for a, b in zip(want, got)])
+        if not same.all():
+            row = int(np.argmin(same))
+            differences.append(
+                f"{name}: {column} differs in {int((~same).sum())} rows, "
+                f"first at row {row}: {got[row]!r} != {want[row]!r}"
+            )
+    return differences
+
+
+def check_engines() -> list[str]:
+    """Every Aggregation the pages run gives the same result on every engine."""
+    orders = synthetic_orders()
+    cube = OrderCube.from_orders(orders)
+    year, month = max(cube.months)
+    states = list(cube.data.index.get_level_values("State").unique()[:5])
+    # The roll-ups of common.superstore, then every function with a scalar
+    # filter on an index level.
+    cases = {
+        "cube": (orders, Aggregation(CUBE_KEYS, MEASURE_SUMS)),
+        "state": (cube.data, Aggregation(["State"], MEASURE_SUMS)),
+        "state_month": (
+            cube.data,
+            Aggregation(["State", "Year", "Month"], MEASURE_SUMS),
+        ),
+        "subcategory": (
+            cube.period(year, month),
+            Aggregation(
+                ["State", "Sub-Category"], MEASURE_SUMS, filters={"State": states}
+            ),
+        ),
+    }
+    for function in sorted(FUNCTIONS):
+        cases[function] = (
+            cube.data,
+            Aggregation(
+                ["Sub-Category"], {"Sales": function}, filters={"Year": year}
+            ),
+        )
+
+    differences = []
+    for name, (frame, spec) in cases.items():
+        expected = aggregate(frame, spec, engine="pandas")
+        for engine in sorted(ENGINES.keys() - {"pandas"}):
+            try:
+                actual = aggregate(frame, spec, engine=engine)
+            except ImportError as err:
+                # duckdb and polars are optional, left out of requirements.txt.
+                differences.append(Skipped(f"{engine}: not installed ({err.name})"))
+                continue
+            differences += frame_differences(f"{engine} {name}", expected, actual)
+    return sorted(set(differences))
+
+
+def reference_lttb(x, y, threshold: int) -> list[int]:
+    """LTTB as in Steinarsson's thesis, one point at a time, for comparison."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    kept = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Buckets split the n - 2 inner points; integer division keeps the
+        # boundaries exact.
+        start = i * (n - 2) // (threshold - 2) + 1
+        stop = (i + 1) * (n - 2) // (threshold - 2) + 1
+        next_stop = min((i + 2) * (n - 2) // (threshold - 2) + 1, n)
+        next_x = sum(x[stop:next_stop]) / (next_stop - stop)
+        next_y = sum(y[stop:next_stop]) / (next_stop - stop)
+        best, best_area = start, -1.0
+        for j in range(start, stop):
+            area = abs(
+                (x[a] - next_x) * (y[j] - y[a]) - (x[a] - x[j]) * (next_y - y[a])
+            )
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    return kept + [n - 1]
+
+
+def check_lttb() -> list[str]:
+    """lttb_indices keeps the points of the reference implementation."""
+    rng = np.random.default_rng(0)
+    differences = []
+    for n in (2, 3, 10, 97, 1_000):
+        for threshold in (0, 3, 4, 12, 50, n - 1, n, n + 1):
+            x = np.cumsum(rng.integers(1, 4, n)).astype(np.float64)
+            walk = np.cumsum(rng.normal(size=n))
+            # Plateaus give equal areas, where the first point must win.
+            for name, y in {"walk": walk, "steps": np.round(walk)}.items():
+                expected = reference_lttb(list(x), list(y), threshold)
+                actual = lttb_indices(x, y, threshold).tolist()
+                if actual != expected:
+                    differences.append(
+                        f"{name} n={n} threshold={threshold}: kept {actual[:8]}... "
+                        f"!= {expected[:8]}..."
+                    )
+
+            # NaN values, at the ends too: the finite points are thinned as
+            # if alone, and the ends are kept whatever their value.
+            y = walk.copy()
+            y[rng.random(n) < 0.2] = np.nan
+            y[0] = np.nan
+            y[-1] = np.nan if n % 2 else walk[-1]
+            actual = lttb_indices(x, y, threshold)
+            if threshold >= n or threshold < 3:
+                if actual.tolist() != list(range(n)):
+                    differences.append(f"nan n={n} threshold={threshold}: thinned")
+                continue
+            valid = np.flatnonzero(np.isfinite(y))
+            budget = threshold - int(np.isnan(y[0])) - int(np.isnan(y[-1]))
+            if budget >= 3:
+                kept = valid[reference_lttb(list(x[valid]), list(y[valid]), budget)]
+            else:
+                kept = valid[[0, -1]][:budget]
+            expected = sorted({*kept.tolist(), 0, n - 1})
+            if actual.tolist() != expected:
+                differences.append(
+                    f"nan n={n} threshold={threshold}: kept {actual[:8].tolist()}"
+                    f"... != {expected[:8]}..."
+                )
+    return differences
+
+
+class ReferenceGreedyDual:
+    """GreedyDual-Size on a heap, for comparison with ``BoundedCache``.
+
+    Equal credits are evicted in the order the entries were put, as the
+    cache's scan over its insertion-ordered dict does.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.clock = 0.0
+        self.size = 0
+        self.evictions = 0
+        # key -> [credit, sequence, size, priority]
+        self.entries = {}
+        self._heap = []
+        self._sequence = 0
+
+    def get(self, key) -> bool:
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        entry[0] = self.clock + entry[3] / entry[2]
+        heapq.heappush(self._heap, (entry[0], entry[1], key))
+        return True
+
+    def put(self, key, size: int, priority: float):
+        if size > self.budget_bytes:
+            return
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[2]
+        self._sequence += 1
+        credit = self.clock + priority / size
+        self.entries[key] = [credit, self._sequence, size, priority]
+        heapq.heappush(self._heap, (credit, self._sequence, key))
+        self.size += size
+        while self.size > self.budget_bytes:
+            credit, sequence, victim = heapq.heappop(self._heap)
+            entry = self.entries.get(victim)
+            if entry is None or entry[:2] != [credit, sequence]:
+                continue  # superseded by a later get or put
+            self.clock = credit
+            self.size -= self.entries.pop(victim)[2]
+            self.evictions += 1
+
+
+def check_cache_eviction() -> list[str]:
+    """BoundedCache evicts the entries GreedyDual-Size says it should."""
+    rng = np.random.default_rng(0)
+    # Figures and aggregates of many sizes, some over the budget; requests
+    # are skewed towards a few keys, as page reruns are.
+    keys = range(60)
+    sizes = {key: int(rng.integers(1, 400)) for key in keys}
+    priorities = {key: (FIGURE, AGGREGATE)[key % 2] for key in keys}
+    values = {key: pd.DataFrame({"Sales": np.zeros(sizes[key])}) for key in keys}
+    budget = sum(payload_bytes(value) for value in values.values()) // 5
+    weights = 1 / np.arange(1, len(keys) + 1)
+
+    cache = BoundedCache(budget)
+    reference = ReferenceGreedyDual(budget)
+    for step, key in enumerate(rng.choice(keys, 5_000, p=weights / weights.sum())):
+        key = int(key)
+        hit, _ = cache.get((key,))
+        if hit != reference.get(key):
+            return [f"step {step}: key {key} hit={hit}, expected {not hit}"]
+        if not hit:
+            cache.put((key,), "check", values[key], priorities[key])
+            reference.put(key, payload_bytes(values[key]), priorities[key])
+
+        held = {k for (k,) in cache.entries}
+        if held != set(reference.entries):
+            return [
+                f"step {step}: holds {sorted(held ^ set(reference.entries))} "
+                "differently from the reference"
+            ]
+        if cache.size != sum(entry.size for entry in cache.entries.values()):
+            return [f"step {step}: size {cache.size} is not the sum of its entries"]
+        if cache.size > budget:
+            return [f"step {step}: {cache.size} bytes held over a {budget} budget"]
+    if cache.evictions != reference.evictions:
+        return [f"{cache.evictions} evictions, expected {reference.evictions}"]
+    if reference.evictions == 0:
+        return ["the trace never filled the cache"]
+    return []
+
+
+def check_stream_snapshot() -> list[str]:
+    """SourceChunks and read_snapshot serve a rewritten local file alike.
+
+    Online and offline, a local file changed since its snapshot must be read
+    again by both paths, never refused or served stale. Each rewrite is seen
+    first by one path, then by the other.
+    """
+    read_kwargs = {"parse_dates": ["Order Date"]}
+    differences = []
+    cache_dir = common.snapshot.CACHE_DIR
+    with tempfile.TemporaryDirectory() as directory:
+        source = str(Path(directory) / "orders.csv")
+        try:
+            for offline in (False, True):
+                common.snapshot.CACHE_DIR = Path(directory) / f"offline-{offline}"
+                for step, rows in enumerate([1_000, 1_500, 2_000, 2_500]):
+                    name = f"offline={offline} step={step}"
+                    write_tables(order_tables(rows, seed=step), Path(source))
+                    chunks = SourceChunks(source, 300, offline=offline, **read_kwargs)
+                    paths = {
+                        "read": lambda: len(
+                            read_snapshot(source, offline=offline, **read_kwargs)
+                        ),
+                        "stream": lambda: sum(len(chunk) for chunk in chunks),
+                    }
+                    order = ["read", "stream"] if step % 2 else ["stream", "read"]
+                    try:
+                        counts = {path: paths[path]() for path in order}
+                    except SnapshotUnavailable as err:
+                        differences.append(f"{name}: {err}")
+                        continue
+                    if set(counts.values()) != {rows}:
+                        differences.append(f"{name}: {counts} rows, wrote {rows}")
+                    if chunks.sha256 != snapshot_fingerprint(source, **read_kwargs):
+                        differences.append(f"{name}: stale stream fingerprint")
+        finally:
+            common.snapshot.CACHE_DIR = cache_dir
+    return differences
+
+
+PLOTLY_CHART_SCRIPT = """
+import plotly.graph_objects as go
+import streamlit as st
+from common.charts import figure_spec, plotly_chart
+
+fig = go.Figure(go.Scatter(x=[1, 2, 3], y=[3, 1, 2], customdata=["a", "b", "c"]))
+fig.update_layout(width=500, height=300)
+st.plotly_chart(
+    fig, theme=None, key="expected", on_select="rerun", selection_mode="points"
+)
+plotly_chart(
+    figure_spec(fig),
+    theme=None,
+    key="actual",
+    on_select="rerun",
+    selection_mode="points",
+)
+"""
+
+
+def check_plotly_chart() -> list[str]:
+    """common.charts.plotly_chart sends what st.plotly_chart sends.
+
+    Once through the fast path on Streamlit internals, and once through the
+    fallback, with those internals failing as a changed signature would.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    def broken(*args, **kwargs):
+        raise TypeError("unexpected keyword argument")
+
+    differences = []
+    register = common.charts.compute_and_register_element_id
+    logger = logging.getLogger(common.charts.__name__)
+    for path in ("fast", "fallback"):
+        if path == "fallback":
+            # The failure is expected here; keep its warning out of the output.
+            common.charts.compute_and_register_element_id = broken
+            logger.disabled = True
+        try:
+            app = AppTest.from_string(PLOTLY_CHART_SCRIPT).run()
+        finally:
+            common.charts.compute_and_register_element_id = register
+            logger.disabled = False
+        if app.exception:
+            differences.append(f"{path}: {app.exception[0].message}")
+            continue
+        expected, actual = (element.proto for element in app.get("plotly_chart"))
+        if json.loads(actual.spec) != json.loads(expected.spec):
+            differences.append(f"{path}: the figure JSON differs")
+        for field in ("theme", "selection_mode", "config", "form_id"):
+            if getattr(actual, field) != getattr(expected, field):
+                differences.append(
+                    f"{path}: {field} {getattr(actual, field)!r} "
+                    f"!= {getattr(expected, field)!r}"
+                )
+    return differences
+
+
+CHECKS: dict[str, Callable[[], list[str]]] = {
+    "engines": check_engines,
+    "lttb": check_lttb,
+    "cache_eviction": check_cache_eviction,
+    "stream_snapshot": check_stream_snapshot,
+    "plotly_chart": check_plotly_chart,
+}
+
+
+def run_checks(names=None) -> dict[str, list[str]]:
+    return {name: CHECKS[name]() for name in names or CHECKS}
@@ -0,0 +1,66 @@
+"""Local fixture files at a multiple of the real dataset size.
+
+A fixture is the real dataset, read once through its snapshot, repeated
+``scale`` times and written to CSV in the format of the original file. Each
+copy is written as its own chunk so memory stays at one copy whatever the
+scale.
+"""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pandas as pd
+
+from common.snapshot import read_snapshot, snapshot_fingerprint
+
+
+def population_copies(data_df: pd.DataFrame, scale: int) -> Iterator[pd.DataFrame]:
+    # Each copy is a new set of countries, so there are more pyramids to
+    # partition while every single pyramid keeps its real size.
+    yield data_df
+    for copy in range(2, scale + 1):
+        yield data_df.assign(Country=data_df["Country"] + f" ({copy})")
+
+
+def order_copies(data_df: pd.DataFrame, scale: int) -> Iterator[pd.DataFrame]:
+    # More orders for the same states, months and sub-categories: the cube
+    # keeps its shape, only the data it is built from grows.
+    rows = len(data_df)
+    yield data_df
+    for copy in range(2, scale + 1):
+        yield data_df.assign(
+            **{
+                "Row ID": range((copy - 1) * rows + 1, copy * rows + 1),
+                "Order ID": data_df["Order ID"] + f"-{copy}",
+            }
+        )
+
+
+# Keyed by the dataset names listed in the pages' PAGE metadata.
+COPIES = {
+    "eu27_population": population_copies,
+    "superstore_orders": order_copies,
+}
+
+
+def write_fixture(dataset: str, source: str, scale: int, directory: Path) -> Path:
+    """Write ``dataset`` at ``scale`` times its size; reuse an existing file.
+
+    Fixtures are named after the SHA-256 of the source, so regenerating a
+    local source at the same path writes new fixtures instead of reusing the
+    old ones.
+    """
+    # Reading the snapshot first revalidates it against a changed local file.
+    data_df = read_snapshot(source)
+    path = directory / f"{dataset}-{snapshot_fingerprint(source)[:16]}-{scale}x.csv"
+    if path.exists():
+        return path
+
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".csv.tmp")
+    for copy, chunk in enumerate(COPIES[dataset](data_df, scale)):
+        chunk.to_csv(
+            tmp_path, mode="w" if copy == 0 else "a", header=copy == 0, index=False
+        )
+    tmp_path.replace(path)
+    return path
@@ -0,0 +1,117 @@
+"""The stages of each week page, in the order the page runs them.
+
+A pipeline is a generator over ``(stage, call)`` pairs. The runner times each
+``call`` and sends its result back, so a stage can feed the next one the way
+the page body does. Calls go to the unwrapped functions to bypass the caches;
+the selections are the ones a first visit to the page renders.
+"""
+
+import inspect
+from collections.abc import Callable, Generator
+from types import ModuleType
+from typing import Any
+
+from common.dag import Task, run_dag
+
+Pipeline = Generator[tuple[str, Callable[[], Any]], Any, None]
+
+# Months per state kept by the downsampled line chart stage.
+DOWNSAMPLE_POINTS = 12
+# Chunk size of the streaming load stage.
+STREAM_ROWS = 10_000
+
+
+def uncached(func):
+    return inspect.unwrap(func)
+
+
+def week_15(page: ModuleType, sources: dict[str, str]) -> Pipeline:
+    data_handle = yield "load_data", lambda: uncached(page.load_data)(
+        sources["eu27_population"]
+    )
+    countries = data_handle.data.countries
+    years = data_handle.data.years
+    filtered_handles = yield "filter_data", lambda: page.filter_data(
+        data_handle, countries[14], years[-1], countries[0], years[-1]
+    )
+    yield "plot_template", uncached(page.plot_template)
+    yield "plot", lambda: uncached(page.plot)(*filtered_handles)
+    yield "plot_years", lambda: uncached(page.plot_years)(
+        data_handle, countries[14], years[-1], filtered_handles[1]
+    )
+
+
+def week_16(page: ModuleType, sources: dict[str, str]) -> Pipeline:
+    state = "Pennsylvania"
+    state_number = -1
+
+    # Before load_data, which would write the snapshot first. The first call
+    # streams the source and writes the snapshot; the repeats stream that.
+    yield "load_data[stream]", lambda: uncached(page.load_data)(
+        sources["superstore_orders"], STREAM_ROWS
+    )
+    cube_handle = yield "load_data", lambda: uncached(page.load_data)(
+        sources["superstore_orders"]
+    )
+    profit_handle = yield "transform_data", lambda: uncached(page.transform_data)(
+        cube_handle
+    )
+    reference_box_handle = yield "reference_box", lambda: uncached(page.reference_box)(
+        profit_handle
+    )
+    bar_handle = yield "bar_data", lambda: uncached(page.bar_data)(
+        profit_handle, reference_box_handle, state
+    )
+    yield "plot_profit_ratio_vs_sales", lambda: uncached(
+        page.plot_profit_ratio_vs_sales
+    )(profit_handle, state, page.HIGHLIGHT_IN_BROWSER)
+    yield "plot_bar_chart", lambda: uncached(page.plot_bar_chart)(bar_handle, state)
+    month_handle = yield "transform_data_month", lambda: uncached(
+        page.transform_data_month
+    )(cube_handle)
+    plot_lines = uncached(page.plot_profit_ratio_vs_sales_year)
+    yield "plot_profit_ratio_vs_sales_year", lambda: plot_lines(
+        month_handle,
+        bar_handle,
+        state,
+        state,
+        page.MERGE_LINE_TRACES,
+        page.WEBGL_POINTS,
+        page.DOWNSAMPLE_POINTS,
+    )
+    # The WebGL and downsampled variants, whatever the page is set to.
+    yield "plot_profit_ratio_vs_sales_year[webgl]", lambda: plot_lines(
+        month_handle, bar_handle, state, state, page.MERGE_LINE_TRACES, 0
+    )
+    yield "plot_profit_ratio_vs_sales_year[lttb]", lambda: plot_lines(
+        month_handle,
+        bar_handle,
+        state,
+        state,
+        page.MERGE_LINE_TRACES,
+        page.WEBGL_POINTS,
+        DOWNSAMPLE_POINTS,
+    )
+    # The figures of a full page run with their data stages, independent
+    # ones in parallel, as common.dag runs them.
+    tasks = {
+        name: Task(uncached(task.func), *task.args, **task.kwargs)
+        for name, task in page.figure_tasks(
+            cube_handle, state, state, state_number, None, None
+        ).items()
+    }
+    yield "figure_tasks[dag]", lambda: tuple(run_dag(tasks, tasks).results.values())
+    yield "plot_subcategory_sales", lambda: uncached(page.plot_subcategory_sales)(
+        cube_handle, bar_handle, state_number, None, None
+    )
+    year, month = max(cube_handle.data.months)
+    yield "plot_subcategory_sales[month]", lambda: uncached(
+        page.plot_subcategory_sales
+    )(cube_handle, bar_handle, state_number, year, month)
+
+
+# Keyed by page path, as discovered by pages.discover_pages().
+PIPELINES = {
+    "wow/2025/week_15.py": week_15,
+    "wow/2025/week_16.py": week_16,
+}
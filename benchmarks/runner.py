@@ -0,0 +1,229 @@
+"""Time the page pipelines and compare two results files.
+
+For every page and scale, each stage is called once (``first_s``; for
+``load_data`` this includes building the snapshot), ``repeat`` more times
+(``min_s``, ``median_s``) and once under ``tracemalloc`` for ``peak_bytes``.
+``tracemalloc`` sees the Python and NumPy heap, not Arrow buffers or mapped
+snapshot pages. ``figure_bytes`` is the size of the JSON ``st.plotly_chart``
+sends for the figures a stage returns.
+"""
+
+import datetime
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import time
+import tracemalloc
+from importlib import metadata
+from pathlib import Path
+
+import plotly.io as pio
+from plotly.basedatatypes import BaseFigure
+
+import common.snapshot
+from common.snapshot import configured_source
+import pages
+from common.charts import FigureSpec
+from benchmarks.fixtures import write_fixture
+from benchmarks.pipelines import PIPELINES
+
+PACKAGES = ["numpy", "pandas", "plotly", "pyarrow", "streamlit"]
+
+
+def figure_bytes(result) -> int | None:
+    results = result if isinstance(result, tuple) else (result,)
+    sizes = [
+        (
+            len(item.json.encode())
+            if isinstance(item, FigureSpec)
+            else len(pio.to_json(item, validate=False).encode())
+        )
+        for item in results
+        if isinstance(item, (FigureSpec, BaseFigure))
+    ]
+    return sum(sizes) if sizes else None
+
+
+def measure(call, repeat: int):
+    start = time.perf_counter()
+    result = call()
+    first = time.perf_counter() - start
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, {
+        "first_s": first,
+        "min_s": min(times, default=first),
+        "median_s": statistics.median(times) if times else first,
+        "peak_bytes": peak,
+        "figure_bytes": figure_bytes(result),
+    }
+
+
+def run_pipeline(pipeline, repeat: int) -> list[dict]:
+    records = []
+    result = None
+    try:
+        while True:
+            stage, call = pipeline.send(result)
+            result, record = measure(call, repeat)
+            records.append({"stage": stage, **record})
+    except StopIteration:
+        pass
+    return records
+
+
+def run(
+    scales: list[int],
+    repeat: int,
+    workdir: Path,
+    page_filter: list[str] | None = None,
+    sources: dict[str, str] | None = None,
+) -> dict:
+    page_infos = [
+        page
+        for page in pages.discover_pages()
+        if not page_filter or any(name in page.path for name in page_filter)
+    ]
+    modules = {}
+    fixtures = {}
+    for page in page_infos:
+        if page.path not in PIPELINES:
+            print(f"skipping {page.path}: no pipeline in benchmarks/pipelines.py")
+            continue
+        modules[page] = pages.load_page_module(pages.ROOT / page.path)
+        for dataset in page.datasets:
+            source = (sources or {}).get(dataset) or configured_source(
+                dataset, modules[page].DATA_SOURCE
+            )
+            for scale in scales:
+                fixtures[dataset, scale] = write_fixture(
+                    dataset, source, scale, workdir / "fixtures"
+                )
+
+    # The pipelines snapshot the fixtures in a scratch directory, emptied
+    # before each run so that the first load_data call is a cold one.
+    snapshot_dir = workdir / "snapshots"
+    common.snapshot.CACHE_DIR = snapshot_dir
+
+    results = []
+    print(RECORD_HEADER)
+    for page, module in modules.items():
+        for scale in scales:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            page_sources = {
+                dataset: str(fixtures[dataset, scale]) for dataset in page.datasets
+            }
+            pipeline = PIPELINES[page.path](module, page_sources)
+            for record in run_pipeline(pipeline, repeat):
+                results.append(
+                    {
+                        "page": page.path,
+                        "scale": scale,
+                        "fixture_bytes": sum(
+                            Path(path).stat().st_size for path in page_sources.values()
+                        ),
+                        **record,
+                    }
+                )
+                print(format_record(results[-1]))
+
+    return {"meta": run_metadata(repeat), "results": results}
+
+
+def run_metadata(repeat: int) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=pages.ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": {name: metadata.version(name) for name in PACKAGES},
+    }
+
+
+def format_bytes(size: int | None) -> str:
+    if size is None:
+        return "-"
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+RECORD_HEADER = (
+    f"{'page':<22} {'scale':>5} {'stage':<40}"
+    f"{'first':>10} {'median':>10} {'peak':>10} {'figure':>10}"
+)
+
+
+def format_record(record: dict) -> str:
+    return (
+        f"{record['page']:<22} {record['scale']:>4}x {record['stage']:<40}"
+        f"{record['first_s'] * 1000:>8.1f}ms"
+        f"{record['median_s'] * 1000:>8.1f}ms"
+        f"{format_bytes(record['peak_bytes']):>11}"
+        f"{format_bytes(record['figure_bytes']):>11}"
+    )
+
+
+def compare(base: dict, new: dict) -> list[str]:
+    """One line per stage and scale: median times, their ratio, figure sizes."""
+    base_records = {
+        (record["page"], record["scale"], record["stage"]): record
+        for record in base["results"]
+    }
+    lines = [
+        f"{'page':<22} {'scale':>5} {'stage':<40}"
+        f"{'base':>10} {'new':>10} {'ratio':>7} {'figure':>21}"
+    ]
+    for record in new["results"]:
+        key = (record["page"], record["scale"], record["stage"])
+        if key not in base_records:
+            continue
+        before = base_records[key]
+        ratio = record["median_s"] / before["median_s"] if before["median_s"] else 0
+        figure = (
+            f"{format_bytes(before['figure_bytes'])} -> "
+            f"{format_bytes(record['figure_bytes'])}"
+        )
+        lines.append(
+            f"{record['page']:<22} {record['scale']:>4}x {record['stage']:<40}"
+            f"{before['median_s'] * 1000:>8.1f}ms"
+            f"{record['median_s'] * 1000:>8.1f}ms"
+            f"{ratio:>7.2f} {figure:>21}"
+        )
+    return lines
+
+
+def write_results(results: dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2))
+
+
+def read_results(path: Path) -> dict:
+    return json.loads(path.read_text())
@@ -0,0 +1,415 @@
+"""Seeded synthetic datasets with the schema of the week pages' sources.
+
+``order_tables`` mimics ``Sample-Superstore_Orders.csv`` (including the
+``$1,234.56`` Sales strings) and ``population_tables`` mimics
+``EU27_population_2015-2024.CSV``. Both yield pyarrow tables chunk by chunk,
+built with array operations only, so millions of rows are written without
+ever holding the whole dataset::
+
+    python -m benchmarks generate superstore_orders orders.parquet --rows 5000000
+    python -m benchmarks generate eu27_population population.csv --countries 500
+
+The same seed and chunk size always give the same file. Point a page at it
+with ``WOW_SOURCE_SUPERSTORE_ORDERS`` / ``WOW_SOURCE_EU27_POPULATION``.
+"""
+
+import os
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# Ordered by their share of the real orders: the first states drawn are the
+# busiest ones, and a small ``states`` count still includes Pennsylvania, the
+# Week 16 default.
+STATE_REGIONS = {
+    "California": "West",
+    "New York": "East",
+    "Texas": "Central",
+    "Pennsylvania": "East",
+    "Washington": "West",
+    "Illinois": "Central",
+    "Ohio": "East",
+    "Florida": "South",
+    "Michigan": "Central",
+    "North Carolina": "South",
+    "Arizona": "West",
+    "Virginia": "South",
+    "Georgia": "South",
+    "Tennessee": "South",
+    "Colorado": "West",
+    "Indiana": "Central",
+    "Kentucky": "South",
+    "Massachusetts": "East",
+    "New Jersey": "East",
+    "Oregon": "West",
+    "Wisconsin": "Central",
+    "Maryland": "East",
+    "Delaware": "East",
+    "Minnesota": "Central",
+    "Connecticut": "East",
+    "Oklahoma": "Central",
+    "Missouri": "Central",
+    "Alabama": "South",
+    "Arkansas": "South",
+    "Rhode Island": "East",
+    "Utah": "West",
+    "Mississippi": "South",
+    "Louisiana": "South",
+    "South Carolina": "South",
+    "Nevada": "West",
+    "Nebraska": "Central",
+    "New Mexico": "West",
+    "Iowa": "Central",
+    "New Hampshire": "East",
+    "Kansas": "Central",
+    "Idaho": "West",
+    "Montana": "West",
+    "South Dakota": "Central",
+    "Vermont": "East",
+    "District of Columbia": "East",
+    "Maine": "East",
+    "North Dakota": "Central",
+    "West Virginia": "East",
+    "Wyoming": "West",
+}
+REGIONS = ["Central", "East", "South", "West"]
+
+# Sub-category: (category, typical unit price, typical profit margin).
+SUB_CATEGORIES = {
+    "Binders": ("Office Supplies", 20.0, 0.15),
+    "Paper": ("Office Supplies", 15.0, 0.43),
+    "Furnishings": ("Furniture", 30.0, 0.14),
+    "Phones": ("Technology", 120.0, 0.13),
+    "Storage": ("Office Supplies", 70.0, 0.10),
+    "Art": ("Office Supplies", 10.0, 0.24),
+    "Accessories": ("Technology", 75.0, 0.21),
+    "Chairs": ("Furniture", 170.0, 0.08),
+    "Appliances": ("Office Supplies", 85.0, 0.17),
+    "Labels": ("Office Supplies", 10.0, 0.44),
+    "Tables": ("Furniture", 260.0, -0.08),
+    "Envelopes": ("Office Supplies", 25.0, 0.42),
+    "Bookcases": ("Furniture", 200.0, -0.03),
+    "Fasteners": ("Office Supplies", 5.0, 0.31),
+    "Supplies": ("Office Supplies", 30.0, -0.02),
+    "Machines": ("Technology", 300.0, 0.02),
+    "Copiers": ("Technology", 750.0, 0.37),
+}
+CATEGORIES = ["Furniture", "Office Supplies", "Technology"]
+SEGMENTS = ["Consumer", "Corporate", "Home Office"]
+SHIP_MODES = ["Standard Class", "Second Class", "First Class", "Same Day"]
+SHIP_MODE_WEIGHTS = [0.6, 0.2, 0.15, 0.05]
+SHIP_MODE_DAYS = np.array([4, 2, 1, 0])
+DISCOUNTS = np.array([0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8])
+DISCOUNT_WEIGHTS = [0.48, 0.01, 0.37, 0.02, 0.02, 0.01, 0.01, 0.04, 0.04]
+
+EU_COUNTRIES = [
+    "Austria",
+    "Belgium",
+    "Bulgaria",
+    "Croatia",
+    "Cyprus",
+    "Czechia",
+    "Denmark",
+    "Estonia",
+    "Finland",
+    "France",
+    "Germany",
+    "Greece",
+    "Hungary",
+    "Ireland",
+    "Italy",
+    "Latvia",
+    "Lithuania",
+    "Luxembourg",
+    "Malta",
+    "Netherlands",
+    "Poland",
+    "Portugal",
+    "Romania",
+    "Slovakia",
+    "Slovenia",
+    "Spain",
+    "Sweden",
+]
+AGE_LABELS = (
+    ["Less than 1 year", "1 year"]
+    + [f"{age} years" for age in range(2, 100)]
+    + ["100 years or over"]
+)
+
+
+def names(known: list[str], count: int, template: str) -> list[str]:
+    """The first ``count`` known names, then made-up ones from ``template``."""
+    return known[:count] + [template.format(i) for i in range(len(known), count)]
+
+
+def join(*parts, separator: str = "") -> pa.Array:
+    return pc.binary_join_element_wise(
+        *[part if isinstance(part, str) else pa.array(part) for part in parts],
+        separator,
+    )
+
+
+def format_currency(amounts: np.ndarray) -> pa.Array:
+    # Amounts repeat a lot (price x quantity x discount), so each distinct one
+    # is formatted once and the strings are gathered by code.
+    codes, cents = pd.factorize(np.round(amounts * 100).astype(np.int64))
+    texts = pa.array([f"${value / 100:,.2f}" for value in cents])
+    return texts.take(pa.array(codes))
+
+
+def order_tables(
+    rows: int,
+    *,
+    seed: int = 0,
+    states: int = len(STATE_REGIONS),
+    sub_categories: int = len(SUB_CATEGORIES),
+    years: int = 4,
+    first_year: int = 2021,
+    customers: int = 800,
+    products: int = 50,
+    cities: int = 10,
+    chunk_rows: int = 1_000_000,
+) -> Iterator[pa.Table]:
+    """Superstore orders, ``rows`` lines in chunks of ``chunk_rows``.
+
+    ``products`` and ``cities`` are per sub-category and per state.
+    """
+    rng = np.random.default_rng(seed)
+
+    state_names = names(list(STATE_REGIONS), states, "State {}")
+    state_regions = [STATE_REGIONS.get(state) for state in state_names]
+    state_regions = [
+        region or REGIONS[i % len(REGIONS)] for i, region in enumerate(state_regions)
+    ]
+    # Busy states first, with a long tail like the real data.
+    state_weights = 1 / np.arange(1, states + 1)
+    state_weights /= state_weights.sum()
+
+    sub_names = names(list(SUB_CATEGORIES), sub_categories, "Sub-Category {}")
+    sub_specs = [
+        SUB_CATEGORIES.get(sub, (CATEGORIES[i % len(CATEGORIES)], 50.0, 0.1))
+        for i, sub in enumerate(sub_names)
+    ]
+    sub_weights = 1 / np.arange(1, sub_categories + 1) ** 0.5
+    sub_weights /= sub_weights.sum()
+    margins = np.array([margin for _, _, margin in sub_specs])
+
+    # Product pool: one row per (sub-category, product).
+    product_sub = np.repeat(np.arange(sub_categories), products)
+    product_number = np.tile(np.arange(products), sub_categories)
+    product_prices = np.array([price for _, price, _ in sub_specs])[
+        product_sub
+    ] * rng.lognormal(0, 0.6, len(product_sub))
+    categories = pa.array([category for category, _, _ in sub_specs])
+    product_categories = categories.take(pa.array(product_sub))
+    product_ids = join(
+        pc.utf8_upper(pc.utf8_slice_codeunits(product_categories, 0, 3)),
+        pc.utf8_upper(
+            pc.utf8_slice_codeunits(
+                pa.array(sub_names).take(pa.array(product_sub)), 0, 2
+            )
+        ),
+        pc.cast(pa.array(10_000_000 + np.arange(len(product_sub))), pa.string()),
+        separator="-",
+    )
+    product_names = join(
+        pa.array(sub_names).take(pa.array(product_sub)),
+        pc.utf8_lpad(pc.cast(pa.array(product_number), pa.string()), 4, padding="0"),
+        separator=" ",
+    )
+
+    # Customer pool.
+    customer_ids = join(
+        "CU",
+        pc.cast(pa.array(10_000 + np.arange(customers)), pa.string()),
+        separator="-",
+    )
+    customer_names = join(
+        "Customer",
+        pc.cast(pa.array(np.arange(1, customers + 1)), pa.string()),
+        separator=" ",
+    )
+    customer_segments = pa.array(SEGMENTS).take(
+        pa.array(rng.choice(len(SEGMENTS), customers, p=[0.52, 0.30, 0.18]))
+    )
+
+    # City pool: one row per (state, city).
+    city_state = np.repeat(np.arange(states), cities)
+    city_names = join(
+        pa.array(state_names).take(pa.array(city_state)),
+        pc.cast(pa.array(np.tile(np.arange(1, cities + 1), states)), pa.string()),
+        separator=" City ",
+    )
+    postal_codes = pa.array(10_000 + np.arange(states * cities), pa.int64())
+
+    first_day = np.datetime64(f"{first_year}-01-01", "D")
+    days = (np.datetime64(f"{first_year + years}-01-01", "D") - first_day).astype(int)
+
+    orders_before = 0
+    for start in range(0, rows, chunk_rows):
+        size = min(chunk_rows, rows - start)
+        chunk_rng = np.random.default_rng([seed, start // chunk_rows])
+
+        # Orders of one to a few lines: order-level fields are drawn per order
+        # and repeated over its lines.
+        new_order = chunk_rng.random(size) < 0.55
+        new_order[0] = True
+        order = np.cumsum(new_order) - 1
+        orders = order[-1] + 1
+
+        order_dates = first_day + chunk_rng.integers(0, days, orders)
+        ship_modes = chunk_rng.choice(len(SHIP_MODES), orders, p=SHIP_MODE_WEIGHTS)
+        ship_dates = (
+            order_dates + SHIP_MODE_DAYS[ship_modes] + chunk_rng.integers(0, 2, orders)
+        )
+        order_states = chunk_rng.choice(states, orders, p=state_weights)
+        order_cities = order_states * cities + chunk_rng.integers(0, cities, orders)
+        order_customers = chunk_rng.integers(0, customers, orders)
+        order_ids = join(
+            "US",
+            pc.cast(
+                pa.array(order_dates.astype("datetime64[Y]").astype(int) + 1970),
+                pa.string(),
+            ),
+            pc.cast(pa.array(100_000 + orders_before + np.arange(orders)), pa.string()),
+            separator="-",
+        )
+        orders_before += orders
+
+        subs = chunk_rng.choice(sub_categories, size, p=sub_weights)
+        product = subs * products + chunk_rng.integers(0, products, size)
+        quantity = np.minimum(1 + chunk_rng.poisson(2.8, size), 14)
+        discount = DISCOUNTS[chunk_rng.choice(len(DISCOUNTS), size, p=DISCOUNT_WEIGHTS)]
+        sales = np.round(product_prices[product] * quantity * (1 - discount), 2)
+        margin = margins[subs] - 1.2 * discount + chunk_rng.normal(0, 0.1, size)
+        profit = np.round(sales * margin, 4)
+
+        order_index = pa.array(order)
+        city = pa.array(order_cities[order])
+        customer = pa.array(order_customers[order])
+        state = pa.array(order_states[order])
+        product_index = pa.array(product)
+        yield pa.table(
+            {
+                "Row ID": pa.array(start + 1 + np.arange(size)),
+                "Order ID": order_ids.take(order_index),
+                "Order Date": pa.array(order_dates[order]),
+                "Ship Date": pa.array(ship_dates[order]),
+                "Ship Mode": pa.array(SHIP_MODES).take(pa.array(ship_modes[order])),
+                "Customer ID": customer_ids.take(customer),
+                "Customer Name": customer_names.take(customer),
+                "Segment": customer_segments.take(customer),
+                "Country": pa.array(["United States"]).take(
+                    pa.array(np.zeros(size, dtype=np.int64))
+                ),
+                "City": city_names.take(city),
+                "State": pa.array(state_names).take(state),
+                "Postal Code": postal_codes.take(city),
+                "Region": pa.array(state_regions).take(state),
+                "Product ID": product_ids.take(product_index),
+                "Category": product_categories.take(product_index),
+                "Sub-Category": pa.array(sub_names).take(pa.array(subs)),
+                "Product Name": product_names.take(product_index),
+                "Sales": format_currency(sales),
+                "Quantity": pa.array(quantity),
+                "Discount": pa.array(discount),
+                "Profit": pa.array(profit),
+            }
+        )
+
+
+def population_tables(
+    *,
+    seed: int = 0,
+    countries: int = len(EU_COUNTRIES),
+    years: int = 10,
+    first_year: int = 2015,
+    chunk_rows: int = 1_000_000,
+) -> Iterator[pa.Table]:
+    """EU population by country, year and age; whole countries per chunk."""
+    rng = np.random.default_rng(seed)
+    country_names = names(EU_COUNTRIES, countries, "Country {}")
+    ages = np.arange(len(AGE_LABELS))
+    # Roughly flat up to the mid fifties, then thinning out; women live longer.
+    profile = np.where(ages < 55, 1 + 0.004 * ages, 1.22 * np.exp(-(ages - 55) / 14))
+    male_share = np.where(ages < 60, 0.512, 0.512 - 0.004 * (ages - 60))
+
+    populations = rng.lognormal(np.log(8e6), 1.1, countries)
+    growth = rng.normal(0.002, 0.004, countries)
+
+    per_country = years * len(AGE_LABELS)
+    chunk_countries = max(1, chunk_rows // per_country)
+    for start in range(0, countries, chunk_countries):
+        block = np.arange(start, min(start + chunk_countries, countries))
+        chunk_rng = np.random.default_rng([seed, start // chunk_countries])
+
+        # Shape (countries, years, ages), flattened in that order.
+        year_offset = np.arange(years)
+        totals = populations[block, None] * (1 + growth[block, None]) ** year_offset
+        people = (
+            totals[:, :, None]
+            * profile[None, None, :]
+            / profile.sum()
+            * chunk_rng.normal(1, 0.03, (len(block), years, len(ages)))
+        )
+        male = np.round(people * male_share).astype(np.int64)
+        female = np.round(people * (1 - male_share)).astype(np.int64)
+
+        yield pa.table(
+            {
+                "Country": pa.array(country_names).take(
+                    pa.array(np.repeat(block, per_country))
+                ),
+                "Year": pa.array(
+                    np.tile(np.repeat(first_year + year_offset, len(ages)), len(block))
+                ),
+                "Age": pa.array(AGE_LABELS).take(
+                    pa.array(np.tile(ages, len(block) * years))
+                ),
+                "Male": pa.array(male.ravel()),
+                "Female": pa.array(female.ravel()),
+            }
+        )
+
+
+# Keyed by the dataset names listed in the pages' PAGE metadata.
+GENERATORS = {
+    "eu27_population": population_tables,
+    "superstore_orders": order_tables,
+}
+
+
+def write_tables(tables: Iterable[pa.Table], path: Path) -> int:
+    """Write the chunks to ``path`` as CSV or Parquet, by suffix; return rows."""
+    parquet = path.suffix.lower() == ".parquet"
+    tmp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    writer = None
+    rows = 0
+    try:
+        for table in tables:
+            if writer is None:
+                writer = (
+                    pq.ParquetWriter(tmp_path, table.schema)
+                    if parquet
+                    else pa_csv.CSVWriter(
+                        tmp_path,
+                        table.schema,
+                        write_options=pa_csv.WriteOptions(quoting_style="needed"),
+                    )
+                )
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, path)
+    return rows
@@ -0,0 +1,149 @@
+"""Grouped aggregations described as data and run by a configurable engine.
+
+Pages describe what they want instead of how to compute it::
+
+    aggregate(cube, Aggregation(keys=["State"], measures={"Sales": "sum"}))
+
+and ``WOW_ENGINE`` picks who computes it:
+
+- ``pandas`` (default): single-threaded, no extra dependency.
+- ``duckdb`` or ``polars``: multithreaded columnar engines for large inputs,
+  used only when configured (``pip install duckdb`` / ``pip install polars``).
+
+Every engine reads the same frame (loaded from the local snapshot) and returns
+the same shape: one row per distinct ``keys`` tuple, indexed and sorted by the
+keys, with one column per measure in ``measures`` order. Keys, measures and
+filters may name columns or index levels of the frame.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+ENGINE = os.environ.get("WOW_ENGINE", "pandas").lower()
+
+FUNCTIONS = {"sum", "mean", "min", "max", "count"}
+
+
+@dataclass(frozen=True)
+class Aggregation:
+    """Group by ``keys`` and reduce each of ``measures`` with its function.
+
+    ``filters`` keep the rows whose column equals a scalar, or is in a list of
+    values, before grouping.
+    """
+
+    keys: list[str]
+    measures: dict[str, str]
+    filters: dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        unknown = set(self.measures.values()) - FUNCTIONS
+        if unknown:
+            raise ValueError(f"Unsupported aggregation functions: {sorted(unknown)}")
+
+
+def aggregate(frame: pd.DataFrame, spec: Aggregation, engine: str | None = None):
+    engine = engine or ENGINE
+    try:
+        run = ENGINES[engine]
+    except KeyError:
+        raise ValueError(
+            f"Unknown engine {engine!r}, expected one of {sorted(ENGINES)}"
+        ) from None
+    return run(frame, spec)
+
+
+def _values(frame: pd.DataFrame, name: str):
+    if name in frame.columns:
+        return frame[name]
+    return frame.index.get_level_values(name)
+
+
+def _filter_values(value) -> list:
+    if isinstance(value, (list, tuple, set, np.ndarray, pd.Index, pd.Series)):
+        return list(value)
+    return [value]
+
+
+def _columns(frame: pd.DataFrame, spec: Aggregation) -> pd.DataFrame:
+    # The columnar engines get plain columns; index levels become columns.
+    names = list(dict.fromkeys([*spec.keys, *spec.filters, *spec.measures]))
+    return pd.DataFrame({name: _values(frame, name).array for name in names})
+
+
+def _pandas(frame: pd.DataFrame, spec: Aggregation) -> pd.DataFrame:
+    if spec.filters:
+        mask = np.ones(len(frame), dtype=bool)
+        for name, value in spec.filters.items():
+            mask &= np.asarray(_values(frame, name).isin(_filter_values(value)))
+        frame = frame.loc[mask]
+    grouped = frame.groupby(spec.keys, observed=True, sort=True)
+    return grouped[list(spec.measures)].agg(spec.measures)
+
+
+SQL_FUNCTIONS = {
+    "sum": "SUM",
+    "mean": "AVG",
+    "min": "MIN",
+    "max": "MAX",
+    "count": "COUNT",
+}
+
+
+def _duckdb(frame: pd.DataFrame, spec: Aggregation) -> pd.DataFrame:
+    import duckdb
+
+    def quote(name):
+        return '"' + name.replace('"', '""') + '"'
+
+    con = duckdb.connect()
+    try:
+        con.register("frame", _columns(frame, spec))
+        where = []
+        for i, (name, value) in enumerate(spec.filters.items()):
+            con.register(f"filter_{i}", pd.DataFrame({"value": _filter_values(value)}))
+            where.append(f"{quote(name)} IN (SELECT value FROM filter_{i})")
+        keys = ", ".join(quote(key) for key in spec.keys)
+        measures = ", ".join(
+            f"{SQL_FUNCTIONS[function]}({quote(name)}) AS {quote(name)}"
+            for name, function in spec.measures.items()
+        )
+        query = f"SELECT {keys}, {measures} FROM frame"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" GROUP BY {keys} ORDER BY {keys}"
+        return con.execute(query).df().set_index(spec.keys)
+    finally:
+        con.close()
+
+
+def _polars(frame: pd.DataFrame, spec: Aggregation) -> pd.DataFrame:
+    import polars as pl
+
+    # Categoricals sort by their physical order in Polars; compare and sort
+    # them as strings to match pandas, whose categories are sorted.
+    query = (
+        pl.from_pandas(_columns(frame, spec))
+        .lazy()
+        .with_columns(pl.col(pl.Categorical).cast(pl.String))
+    )
+    for name, value in spec.filters.items():
+        query = query.filter(pl.col(name).is_in(_filter_values(value)))
+    query = (
+        query.group_by(spec.keys)
+        .agg(
+            [
+                getattr(pl.col(name), function)().alias(name)
+                for name, function in spec.measures.items()
+            ]
+        )
+        .sort(spec.keys)
+    )
+    return query.collect().to_pandas().set_index(spec.keys)
+
+
+ENGINES = {"pandas": _pandas, "duckdb": _duckdb, "polars": _polars}
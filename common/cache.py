@@ -0,0 +1,185 @@
+"""A process-wide, byte-budgeted cache for the pages' derived frames and figures.
+
+``st.cache_data`` keeps every entry forever, per function. ``bounded_cache``
+is a drop-in decorator that stores all functions' results in one ``CACHE``
+with a global byte budget (``WOW_CACHE_BUDGET_MB``, default 256)::
+
+    @bounded_cache(priority=AGGREGATE, hash_funcs=HASH_FUNCS)
+    def transform_data(cube_handle): ...
+
+When the budget is exceeded, entries are evicted GreedyDual-Size style: each
+entry holds a credit of ``priority / size`` on top of a clock that rises to
+the credit of every evicted entry. Large, low-priority, long-unused entries
+go first; small aggregates outlive big figures. Results are shared between
+sessions, not copied, so callers must not mutate them.
+"""
+
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import plotly.io as pio
+from plotly.basedatatypes import BaseFigure
+
+from common.charts import FigureSpec
+
+BUDGET_BYTES = int(float(os.environ.get("WOW_CACHE_BUDGET_MB", 256)) * 2**20)
+
+# Priorities: how much a byte of the result is worth keeping.
+FIGURE = 1
+AGGREGATE = 100
+
+
+def payload_bytes(value) -> int | None:
+    """Frame memory, or JSON size for figures and specs; None if unknown.
+
+    Wrappers that keep their frame as ``.data`` (dataset handles, the pages'
+    tables and cubes) are sized by it, arrays by their ``nbytes``.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, FigureSpec):
+        return len(value.json.encode())
+    if isinstance(value, BaseFigure):
+        return len(pio.to_json(value, validate=False).encode())
+    if isinstance(value, tuple):
+        sizes = [payload_bytes(item) for item in value]
+        sizes = [size for size in sizes if size is not None]
+        return sum(sizes) if sizes else None
+    # Before .data: NumPy arrays have both, and .data is their raw buffer.
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if hasattr(value, "data"):
+        return payload_bytes(value.data)
+    return None
+
+
+@dataclass
+class Entry:
+    function: str
+    value: Any
+    size: int
+    priority: float
+    credit: float
+
+
+class BoundedCache:
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.entries: dict[tuple, Entry] = {}
+        self.size = 0
+        self.evictions = 0
+        self._clock = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        """Return ``(True, value)`` on a hit, ``(False, None)`` otherwise."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            entry.credit = self._clock + entry.priority / entry.size
+            return True, entry.value
+
+    def put(self, key: tuple, function: str, value, priority: float):
+        size = max(payload_bytes(value) or 0, 1)
+        if size > self.budget_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self.entries[key] = Entry(
+                function, value, size, priority, self._clock + priority / size
+            )
+            self.size += size
+            while self.size > self.budget_bytes:
+                victim = min(self.entries, key=lambda k: self.entries[k].credit)
+                self._clock = self.entries[victim].credit
+                self._remove(victim)
+                self.evictions += 1
+
+    def clear(self, function: str | None = None):
+        with self._lock:
+            for key in [
+                key
+                for key, entry in self.entries.items()
+                if function is None or entry.function == function
+            ]:
+                self._remove(key)
+
+    def items(self) -> list[tuple[tuple, Entry]]:
+        with self._lock:
+            return list(self.entries.items())
+
+    def footprint(self) -> dict[str, dict[str, int]]:
+        """Entries and bytes held per function."""
+        with self._lock:
+            report = {}
+            for entry in self.entries.values():
+                usage = report.setdefault(entry.function, {"entries": 0, "bytes": 0})
+                usage["entries"] += 1
+                usage["bytes"] += entry.size
+            return report
+
+    def _remove(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+
+CACHE = BoundedCache(BUDGET_BYTES)
+
+
+def _key_part(value, hash_funcs: dict):
+    for cls, hash_func in hash_funcs.items():
+        if isinstance(value, cls):
+            return hash_func(value)
+    try:
+        hash(value)
+    except TypeError:
+        return hashlib.sha1(pickle.dumps(value)).hexdigest()
+    return value
+
+
+def bounded_cache(*, priority: float = FIGURE, hash_funcs: dict | None = None):
+    """Cache a function's results in ``CACHE`` with the given ``priority``.
+
+    Arguments are keyed by ``hash_funcs`` where their type matches, else by
+    value. The function's source is part of the key, so editing a page does
+    not serve results of the old code.
+    """
+    hash_funcs = hash_funcs or {}
+
+    def decorate(func):
+        code = inspect.unwrap(func).__code__
+        function = f"{Path(code.co_filename).stem}.{func.__name__}"
+        source = hashlib.sha1(inspect.getsource(func).encode()).hexdigest()
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (function, source) + tuple(
+                (name, _key_part(value, hash_funcs))
+                for name, value in bound.arguments.items()
+            )
+            hit, value = CACHE.get(key)
+            if hit:
+                return value
+            value = func(*args, **kwargs)
+            CACHE.put(key, function, value, priority)
+            return value
+
+        wrapper.clear = lambda: CACHE.clear(function)
+        return wrapper
+
+    return decorate
@@ -0,0 +1,152 @@
+"""Plotly figures cached as their serialized JSON.
+
+``st.plotly_chart`` converts every figure it gets back to a dict (a deep copy)
+and serializes it again, even when the figure came straight out of a cache.
+Cached plot functions return ``figure_spec(fig)`` instead: the JSON the browser
+needs, produced once by Plotly's fastest engine (orjson when installed), plus
+the layout size. ``plotly_chart`` puts that JSON on the wire as is.
+
+``plotly_chart`` follows ``st.plotly_chart`` but skips the figure conversion,
+so it reaches into Streamlit internals; requirements.txt pins the Streamlit
+minor version it was written against. If those internals move anyway, it falls
+back to ``st.plotly_chart`` on the decoded spec, which is slower but still
+works. ``python -m benchmarks check --checks plotly_chart`` compares both
+paths after an upgrade.
+"""
+
+import json
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import plotly.io as pio
+import streamlit as st
+
+try:
+    from streamlit.elements.lib.form_utils import current_form_id
+    from streamlit.elements.lib.layout_utils import LayoutConfig
+    from streamlit.elements.lib.policies import check_widget_policies
+    from streamlit.elements.lib.utils import compute_and_register_element_id, to_key
+    from streamlit.elements.plotly_chart import (
+        PlotlyChartSelectionSerde,
+        parse_selection_mode,
+    )
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+    from streamlit.runtime.scriptrunner_utils.script_run_context import (
+        get_script_run_ctx,
+    )
+    from streamlit.runtime.state import register_widget
+except ImportError:
+    PlotlyChartProto = None
+
+_LOGGER = logging.getLogger(__name__)
+
+# Plotly.js defaults, used by Streamlit when the layout has no size.
+DEFAULT_WIDTH = 700
+DEFAULT_HEIGHT = 450
+
+
+@dataclass(frozen=True)
+class FigureSpec:
+    json: str
+    width: int | None = None
+    height: int | None = None
+
+
+def figure_spec(fig) -> FigureSpec:
+    return FigureSpec(
+        pio.to_json(fig, validate=False),
+        fig.layout.width,
+        fig.layout.height,
+    )
+
+
+def plotly_chart(
+    spec: FigureSpec,
+    *,
+    theme: str | None = "streamlit",
+    key: str | None = None,
+    on_select: str | Callable = "ignore",
+    selection_mode=("points", "box", "lasso"),
+    config: dict | None = None,
+    width="stretch",
+    height="content",
+):
+    """``st.plotly_chart`` for a ``FigureSpec``; same arguments and return."""
+    options = dict(
+        theme=theme,
+        key=key,
+        on_select=on_select,
+        selection_mode=selection_mode,
+        config=config,
+        width=width,
+        height=height,
+    )
+    if PlotlyChartProto is not None:
+        try:
+            return _enqueue_spec(spec, **options)
+        except Exception:
+            # Moved internals fail with whatever error their new signature
+            # gives. A genuine argument error is raised again just below.
+            _LOGGER.warning("plotly_chart fast path failed", exc_info=True)
+    return st.plotly_chart(pio.from_json(spec.json), **options)
+
+
+def _enqueue_spec(
+    spec: FigureSpec, *, theme, key, on_select, selection_mode, config, width, height
+):
+    dg = st._main
+    key = to_key(key)
+    on_select_callback = on_select if callable(on_select) else None
+    is_selection_activated = on_select != "ignore"
+    if is_selection_activated:
+        check_widget_policies(
+            dg,
+            key,
+            on_change=on_select_callback,
+            default_value=None,
+            writes_allowed=False,
+            enable_check_callback_rules=on_select_callback is not None,
+        )
+
+    # As much as possible is prepared before the element id is registered, so
+    # that a failure leaves nothing behind for the fallback to collide with.
+    layout_config = LayoutConfig(
+        width=(spec.width or DEFAULT_WIDTH) if width == "content" else width,
+        height=(spec.height or DEFAULT_HEIGHT) if height == "content" else height,
+    )
+    proto = PlotlyChartProto()
+    proto.theme = theme or ""
+    proto.form_id = current_form_id(dg)
+    proto.spec = spec.json
+    proto.config = json.dumps(config or {})
+    if is_selection_activated:
+        proto.selection_mode.extend(parse_selection_mode(selection_mode))
+        serde = PlotlyChartSelectionSerde()
+    proto.id = compute_and_register_element_id(
+        "plotly_chart",
+        user_key=key,
+        key_as_main_identity=False,
+        dg=dg,
+        plotly_spec=proto.spec,
+        plotly_config=proto.config,
+        selection_mode=selection_mode,
+        is_selection_activated=is_selection_activated,
+        theme=theme,
+        width=width,
+        height=height,
+    )
+
+    if not is_selection_activated:
+        return dg._enqueue("plotly_chart", proto, layout_config=layout_config)
+
+    widget_state = register_widget(
+        proto.id,
+        on_change_handler=on_select_callback,
+        deserializer=serde.deserialize,
+        serializer=serde.serialize,
+        ctx=get_script_run_ctx(),
+        value_type="string_value",
+    )
+    dg._enqueue("plotly_chart", proto, layout_config=layout_config)
+    return widget_state.value
@@ -0,0 +1,147 @@
+"""A page pipeline as a small task graph, run on a thread pool.
+
+Each task is a function and its arguments; a ``Ref`` argument stands for the
+result of another task::
+
+    tasks = {
+        "profit": Task(transform_data, cube_handle),
+        "points": Task(plot_profit_ratio_vs_sales, Ref("profit"), state),
+        "bars": Task(plot_bar_chart, Ref("profit"), state),
+    }
+    run = run_dag(tasks, ["points", "bars"], name="week_16.figures")
+    run.results["points"]
+
+``run_dag`` runs the requested tasks and what they depend on, each as soon as
+its inputs are ready, so that independent figure builds (and their JSON
+serialization) overlap. Threads share the page caches and need no pickling,
+but only overlap where NumPy, pandas or the JSON encoder release the GIL.
+``WOW_DAG_WORKERS`` sets the pool size (default 4); 1 runs the tasks one
+after another in the calling thread.
+
+The workers see the caller's Streamlit script run, so the stages a task calls
+are recorded in its metrics (``common.metrics``) as usual. With a ``name``,
+the run records its wall time as that stage and each task's as
+``<name>.<task>``; ``DagRun.timings`` has when each task started and ended.
+"""
+
+import os
+import time
+from collections.abc import Callable, Collection
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from common.metrics import record
+
+WORKERS = int(os.environ.get("WOW_DAG_WORKERS", 4))
+
+
+@dataclass(frozen=True)
+class Ref:
+    """The result of the task ``name``, as an argument of another task."""
+
+    name: str
+
+
+class Task:
+    def __init__(self, func: Callable, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    @property
+    def deps(self) -> list[str]:
+        values = [*self.args, *self.kwargs.values()]
+        return [value.name for value in values if isinstance(value, Ref)]
+
+    def __call__(self, results: dict[str, Any]):
+        def resolve(value):
+            return results[value.name] if isinstance(value, Ref) else value
+
+        return self.func(
+            *map(resolve, self.args),
+            **{key: resolve(value) for key, value in self.kwargs.items()},
+        )
+
+
+@dataclass
+class DagRun:
+    results: dict[str, Any]
+    # Seconds since the run started: (start, end) of each task.
+    timings: dict[str, tuple[float, float]]
+
+
+def needed(tasks: dict[str, Task], targets: Collection[str]) -> list[str]:
+    """``targets`` and the tasks they depend on, dependencies first."""
+    order = []
+    visiting = set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"Task {name!r} depends on itself")
+        visiting.add(name)
+        for dep in tasks[name].deps:
+            visit(dep)
+        order.append(name)
+
+    for name in targets:
+        visit(name)
+    return order
+
+
+def run_dag(
+    tasks: dict[str, Task],
+    targets: Collection[str],
+    *,
+    workers: int = WORKERS,
+    name: str | None = None,
+) -> DagRun:
+    """Run ``targets`` and their dependencies, independent tasks in parallel."""
+    order = needed(tasks, targets)
+    results = {}
+    timings = {}
+    start = time.perf_counter()
+
+    def run_task(task_name):
+        task_start = time.perf_counter()
+        result = tasks[task_name](results)
+        timings[task_name] = (task_start - start, time.perf_counter() - start)
+        return result
+
+    if workers <= 1:
+        for task_name in order:
+            results[task_name] = run_task(task_name)
+    else:
+        ctx = get_script_run_ctx(suppress_warning=True)
+        with ThreadPoolExecutor(
+            workers,
+            thread_name_prefix="dag",
+            initializer=add_script_run_ctx if ctx is not None else None,
+            initargs=(None, ctx) if ctx is not None else (),
+        ) as pool:
+            pending = list(order)
+            running = {}
+            while pending or running:
+                for task_name in [
+                    task_name
+                    for task_name in pending
+                    if all(dep in results for dep in tasks[task_name].deps)
+                ]:
+                    pending.remove(task_name)
+                    running[pool.submit(run_task, task_name)] = task_name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # Raises the task's exception, after which the pool
+                    # finishes the running tasks and drops the pending ones.
+                    results[running.pop(future)] = future.result()
+
+    if name is not None:
+        record(name, time.perf_counter() - start, None)
+        for task_name in order:
+            task_start, task_end = timings[task_name]
+            record(f"{name}.{task_name}", task_end - task_start, None)
+    return DagRun({task_name: results[task_name] for task_name in order}, timings)
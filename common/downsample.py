@@ -0,0 +1,50 @@
+"""Largest-Triangle-Three-Buckets (LTTB) downsampling of line series."""
+
+import numpy as np
+
+
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """Indices of ``threshold`` points of the line ``(x, y)`` that keep its shape.
+
+    The first and last points are always kept. The points in between are split
+    into ``threshold - 2`` buckets. Each bucket keeps the point that spans the
+    largest triangle with the point kept before it and the mean of the next
+    bucket. ``x`` must be sorted. Points whose ``y`` is NaN are never kept,
+    except as the first or last point.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    finite = np.isfinite(y)
+    if not finite.all():
+        # A NaN y (the ratio of a month without sales) makes every area of its
+        # bucket NaN, and argmax would then keep the bucket's first point.
+        # Thin the finite points alone, within what the ends leave over.
+        ends = np.array([0, n - 1])
+        valid = np.flatnonzero(finite)
+        budget = threshold - np.count_nonzero(~finite[ends])
+        if budget >= 3:
+            kept = valid[lttb_indices(x[valid], y[valid], budget)]
+        else:
+            kept = valid[[0, -1]][:budget] if len(valid) else valid
+        return np.union1d(kept, ends)
+
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean()
+        next_y = y[stop:next_stop].mean()
+        area = np.abs(
+            (x[a] - next_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
@@ -0,0 +1,23 @@
+"""Helpers for frames that are sorted by their lookup keys."""
+
+import numpy as np
+import pandas as pd
+
+
+def partition_slices(frame: pd.DataFrame, keys: list[str]) -> dict[tuple, slice]:
+    """Map each distinct ``keys`` tuple of a key-sorted frame to its row slice.
+
+    ``frame.iloc[slice]`` on the result is a view, so looking a partition up
+    costs a dict access instead of a boolean scan over the whole frame.
+    """
+    key_values = [frame[key].to_numpy() for key in keys]
+    starts_partition = np.zeros(len(frame), dtype=bool)
+    starts_partition[:1] = True
+    for values in key_values:
+        starts_partition[1:] |= values[1:] != values[:-1]
+    starts = np.flatnonzero(starts_partition)
+    stops = np.r_[starts[1:], len(frame)]
+    return {
+        tuple(values[start] for values in key_values): slice(start, stop)
+        for start, stop in zip(starts, stops)
+    }
@@ -0,0 +1,58 @@
+"""Cheap cache keys for the frames passed between cached page functions.
+
+``st.cache_data`` hashes every argument on every call, so passing a DataFrame
+costs a full pass over its rows even when the call is a cache hit. Pages pass a
+``DatasetHandle`` instead: the data plus a fingerprint computed once when the
+data is created, and ``HASH_FUNCS`` tells Streamlit to hash only the latter.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from typing import Any
+
+import pandas as pd
+
+
+@dataclass(frozen=True, eq=False)
+class DatasetHandle:
+    name: str
+    fingerprint: str
+    data: Any
+
+    def derive(self, name: str, data: Any, *params) -> "DatasetHandle":
+        """Wrap a frame computed from this one and the scalar ``params``.
+
+        The fingerprint is derived from the inputs, so the result's contents
+        never have to be hashed.
+        """
+        return DatasetHandle(
+            name, combine_fingerprint(self.fingerprint, name, *params), data
+        )
+
+
+def combine_fingerprint(*parts) -> str:
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def frame_fingerprint(data: pd.DataFrame) -> str:
+    row_hashes = pd.util.hash_pandas_object(data, index=True).to_numpy()
+    return combine_fingerprint(
+        list(data.columns), data.shape, hashlib.sha1(row_hashes.tobytes()).hexdigest()
+    )
+
+
+def dataset_handle(
+    name: str, data: Any, source_fingerprint: str | None = None
+) -> DatasetHandle:
+    """Create the root handle of a dataset when it is loaded.
+
+    Pass ``source_fingerprint`` (e.g. the snapshot's SHA-256) when the data is
+    a deterministic function of a source whose hash is already known, to skip
+    hashing the frame itself. It is required when ``data`` is not a DataFrame.
+    """
+    if source_fingerprint is None:
+        source_fingerprint = frame_fingerprint(data)
+    return DatasetHandle(name, combine_fingerprint(name, source_fingerprint), data)
+
+
+HASH_FUNCS = {DatasetHandle: lambda handle: handle.fingerprint}
@@ -0,0 +1,229 @@
+"""Timings, cache hits and payload sizes of the page stages.
+
+Every cached page function is declared through ``instrumented``, which wraps
+the cache decorator so that a call can tell whether the function body
+actually ran (a miss) or the cache answered (a hit)::
+
+    @instrumented(bounded_cache(priority=FIGURE, hash_funcs=HASH_FUNCS))
+    def plot(...): ...
+
+``timed`` measures any other block, e.g. sending the figures. Each page ends
+with ``metrics_panel()``, which shows the current rerun in the sidebar when
+the page is opened with ``?debug=1`` (or ``WOW_DEBUG`` is set), and writes the
+process totals in the Prometheus text format to ``WOW_METRICS_FILE`` if set,
+for a textfile collector to scrape. The panel is the fragment
+``METRICS_FRAGMENT``; a page that reruns only some of its fragments adds that
+key to its ``st.rerun`` so that the panel and the export follow those reruns.
+
+Payload bytes are measured on misses only: the memory of a returned frame, or
+the JSON size of a returned figure. The panel and the export also report the
+footprint of the bounded cache (``common.cache``).
+"""
+
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from common.cache import CACHE, payload_bytes
+
+METRICS_FILE = os.environ.get("WOW_METRICS_FILE")
+DEBUG = os.environ.get("WOW_DEBUG", "").lower() in ("1", "true", "yes")
+
+RUN_KEY = "_stage_metrics"
+METRICS_FRAGMENT = "stage_metrics"
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    hits: int = 0
+    misses: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    payload_bytes: int | None = None
+
+
+_stats: dict[str, StageStats] = {}
+_lock = threading.Lock()
+# Set by the outer wrapper of a call; the inner one appends to it when the
+# function body runs, i.e. on a cache miss.
+_miss = contextvars.ContextVar("_miss", default=None)
+
+
+def record(name: str, seconds: float, hit: bool | None, payload: int | None = None):
+    """Add one call to the process totals and to the current rerun."""
+    with _lock:
+        stats = _stats.setdefault(name, StageStats())
+        stats.calls += 1
+        stats.hits += hit is True
+        stats.misses += hit is False
+        stats.seconds += seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        if payload is not None:
+            stats.payload_bytes = payload
+
+    # Only script runs have a session; the warm-up thread does not.
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        entry = {
+            "stage": name,
+            "ms": seconds * 1000,
+            "cache": {True: "hit", False: "miss", None: "-"}[hit],
+            "payload_bytes": payload,
+        }
+        # Tasks of common.dag record from pool threads of the same script run,
+        # which would race on creating the list.
+        with _lock:
+            st.session_state.setdefault(RUN_KEY, []).append(entry)
+
+
+def instrumented(cache=None, *, name: str | None = None):
+    """Decorate a page stage, optionally cached with ``cache``.
+
+    ``cache`` is a cache decorator such as ``st.cache_resource`` or
+    ``bounded_cache(priority=..., hash_funcs=...)``; without one every call is
+    recorded as uncached. The stage is named ``<page>.<function>`` unless ``name`` is set.
+    """
+
+    def decorate(func):
+        stage_name = name or f"{Path(func.__code__.co_filename).stem}.{func.__name__}"
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            misses = _miss.get()
+            if misses is not None:
+                misses.append(func.__name__)
+            return func(*args, **kwargs)
+
+        cached = cache(compute) if cache is not None else func
+
+        @functools.wraps(cached)
+        def call(*args, **kwargs):
+            misses = []
+            token = _miss.set(misses)
+            start = time.perf_counter()
+            try:
+                result = cached(*args, **kwargs)
+            finally:
+                _miss.reset(token)
+            seconds = time.perf_counter() - start
+            # Sized after the clock stopped, and only when the result is new.
+            record(
+                stage_name,
+                seconds,
+                None if cache is None else not misses,
+                payload_bytes(result) if misses else None,
+            )
+            return result
+
+        if hasattr(cached, "clear"):
+            call.clear = cached.clear
+        return call
+
+    return decorate
+
+
+@contextlib.contextmanager
+def timed(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, None)
+
+
+# (metric, type, help, StageStats attribute)
+EXPORTED = [
+    ("wow_stage_calls_total", "counter", "Stage calls.", "calls"),
+    ("wow_stage_cache_hits_total", "counter", "Cache hits.", "hits"),
+    ("wow_stage_cache_misses_total", "counter", "Cache misses.", "misses"),
+    ("wow_stage_seconds_total", "counter", "Time spent in the stage.", "seconds"),
+    ("wow_stage_seconds_max", "gauge", "Slowest call.", "max_seconds"),
+    ("wow_stage_payload_bytes", "gauge", "Last computed result.", "payload_bytes"),
+]
+
+
+def metrics_text() -> str:
+    """The process totals in the Prometheus text exposition format."""
+    with _lock:
+        stats = sorted((name, vars(value).copy()) for name, value in _stats.items())
+
+    lines = []
+    for metric, kind, help_text, attribute in EXPORTED:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, values in stats:
+            if values[attribute] is not None:
+                lines.append(f'{metric}{{stage="{name}"}} {values[attribute]}')
+
+    lines += [
+        "# HELP wow_cache_budget_bytes Byte budget of the bounded cache.",
+        "# TYPE wow_cache_budget_bytes gauge",
+        f"wow_cache_budget_bytes {CACHE.budget_bytes}",
+        "# HELP wow_cache_evictions_total Entries evicted to stay in budget.",
+        "# TYPE wow_cache_evictions_total counter",
+        f"wow_cache_evictions_total {CACHE.evictions}",
+        "# HELP wow_cache_bytes Bytes held in the bounded cache.",
+        "# TYPE wow_cache_bytes gauge",
+    ]
+    for function, usage in sorted(CACHE.footprint().items()):
+        lines.append(f'wow_cache_bytes{{function="{function}"}} {usage["bytes"]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path: str | os.PathLike):
+    path = Path(path)
+    tmp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+    tmp_path.write_text(metrics_text())
+    os.replace(tmp_path, path)
+
+
+def debug_enabled() -> bool:
+    return DEBUG or st.query_params.get("debug") in ("1", "true")
+
+
+def metrics_panel():
+    """Show this rerun's stages in the sidebar (if enabled) and export."""
+    # A fragment cannot open the sidebar itself, so it is called inside it.
+    with st.sidebar:
+        _stage_metrics()
+
+
+@st.fragment(key=METRICS_FRAGMENT)
+def _stage_metrics():
+    with _lock:
+        run = st.session_state.pop(RUN_KEY, [])
+    if METRICS_FILE:
+        write_metrics_file(METRICS_FILE)
+    if not debug_enabled():
+        return
+
+    st.subheader("Stage metrics")
+    st.caption("This rerun; nested stages are part of their caller's time.")
+    st.dataframe(pd.DataFrame(run), hide_index=True)
+    with st.expander("Since the server started"):
+        with _lock:
+            totals = pd.DataFrame(
+                [{"stage": name, **vars(stats)} for name, stats in _stats.items()]
+            )
+        st.dataframe(totals, hide_index=True)
+    with st.expander("Cache footprint"):
+        st.caption(
+            f"{CACHE.size / 2**20:,.1f} of {CACHE.budget_bytes / 2**20:,.1f} MB, "
+            f"{CACHE.evictions:,} evictions"
+        )
+        footprint = CACHE.footprint()
+        st.dataframe(
+            pd.DataFrame(
+                [{"function": name, **usage} for name, usage in footprint.items()]
+            ),
+            hide_index=True,
+        )
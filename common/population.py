@@ -0,0 +1,76 @@
+"""Data preparation for the EU27 population table used by Week 15."""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from common.frames import partition_slices
+
+PARTITION_KEYS = ["Country", "Year"]
+
+
+@dataclass(frozen=True, eq=False)
+class PopulationTable:
+    """Population rows sorted by (Country, Year), one contiguous block each."""
+
+    data: pd.DataFrame
+    partitions: dict[tuple[str, int], slice]
+
+    @classmethod
+    def from_frame(cls, data_df: pd.DataFrame) -> "PopulationTable":
+        # A stable sort keeps the age order of the source within each block.
+        data_df = data_df.sort_values(PARTITION_KEYS, kind="stable", ignore_index=True)
+        return cls(data_df, partition_slices(data_df, PARTITION_KEYS))
+
+    @property
+    def countries(self) -> list[str]:
+        return sorted({country for country, _ in self.partitions})
+
+    @property
+    def years(self) -> list[int]:
+        return sorted({year for _, year in self.partitions})
+
+    def pyramid(self, country: str, year: int) -> pd.DataFrame:
+        return self.data.iloc[self.partitions[(country, year)]]
+
+
+AGE_RANK_BINS = [15, 65]
+AGE_RANKS = ["Young", "Active population", "Elders"]
+
+
+def prepare_population(data_df: pd.DataFrame) -> pd.DataFrame:
+    """Add Total, Age_Rank and the Male/Female ratios to the raw table.
+
+    Totals are broadcast back with a groupby-transform instead of a merge, and
+    the age labels are parsed once per distinct label through a categorical.
+    """
+    ages = data_df["Age"].astype("category")
+    age_numbers = (
+        ages.cat.categories.str.extract(r"(?P<age>\d+)", expand=False)
+        .astype(int)
+        .to_numpy()[ages.cat.codes.to_numpy()]
+    )
+
+    total = (
+        (data_df["Male"] + data_df["Female"])
+        .groupby([data_df["Country"], data_df["Year"]])
+        .transform("sum")
+    )
+
+    return pd.DataFrame(
+        {
+            "Country": data_df["Country"],
+            "Year": data_df["Year"],
+            "Age": ages,
+            "Male": data_df["Male"],
+            "Female": data_df["Female"],
+            "Total": total,
+            "Age_Rank": pd.Categorical.from_codes(
+                np.digitize(age_numbers, AGE_RANK_BINS), AGE_RANKS
+            ),
+            "Male_Ratio": data_df["Male"] / total,
+            "Female_Ratio": data_df["Female"] / total,
+        },
+        copy=False,
+    )
@@ -0,0 +1,440 @@
+"""Local Arrow IPC snapshots of the remote CSV data sources.
+
+The first process that asks for a source downloads it once, parses it with the
+pyarrow dtype backend and writes an uncompressed Arrow IPC file next to a small
+JSON manifest (source, read options, ETag, SHA-256 of the raw bytes). Every
+later process memory-maps that file instead of going back to the network.
+
+Environment variables:
+
+- ``WOW_CACHE_DIR``: where snapshots live (default: ``.cache/`` in the repo).
+- ``WOW_OFFLINE``: serve only from existing snapshots, never touch the network.
+- ``WOW_SNAPSHOT_MAX_AGE``: seconds after which a snapshot is revalidated with
+  a conditional request (default: never). Snapshots of local files are
+  revalidated whenever the file's mtime or size changes, offline or not.
+- ``WOW_SOURCE_<DATASET>``: a URL or local path (CSV or Parquet) that replaces
+  a page's ``DATA_SOURCE`` for that dataset, e.g.
+  ``WOW_SOURCE_SUPERSTORE_ORDERS=orders.parquet``.
+- ``WOW_STREAM_ROWS``: pages that only keep aggregates of their source read it
+  in chunks of this many rows through ``SourceChunks`` instead of holding the
+  whole table (default: off).
+"""
+
+import datetime
+import hashlib
+import io
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CACHE_DIR = Path(
+    os.environ.get("WOW_CACHE_DIR", Path(__file__).resolve().parent.parent / ".cache")
+)
+OFFLINE = os.environ.get("WOW_OFFLINE", "").lower() in ("1", "true", "yes")
+MAX_AGE = os.environ.get("WOW_SNAPSHOT_MAX_AGE")
+STREAM_ROWS = int(os.environ.get("WOW_STREAM_ROWS") or 0) or None
+
+
+class SnapshotUnavailable(RuntimeError):
+    pass
+
+
+def configured_source(dataset: str, default: str) -> str:
+    """The source configured for ``dataset``, or the page's ``default``."""
+    return os.environ.get(f"WOW_SOURCE_{dataset.upper()}", default)
+
+
+def snapshot_key(source: str, **read_kwargs) -> str:
+    spec = json.dumps([str(source), read_kwargs], sort_keys=True, default=str)
+    return hashlib.sha1(spec.encode()).hexdigest()[:16]
+
+
+def snapshot_paths(source: str, **read_kwargs) -> tuple[Path, Path]:
+    key = snapshot_key(source, **read_kwargs)
+    return CACHE_DIR / f"{key}.arrow", CACHE_DIR / f"{key}.json"
+
+
+def read_manifest(source: str, **read_kwargs) -> dict | None:
+    _, manifest_path = snapshot_paths(source, **read_kwargs)
+    try:
+        return json.loads(manifest_path.read_text())
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_fingerprint(source: str, **read_kwargs) -> str | None:
+    manifest = read_manifest(source, **read_kwargs)
+    return None if manifest is None else manifest["sha256"]
+
+
+def read_snapshot(
+    source: str, *, offline: bool | None = None, refresh: bool = False, **read_kwargs
+) -> pd.DataFrame:
+    """Return ``source`` as a pyarrow-backed DataFrame, served from the snapshot.
+
+    ``read_kwargs`` are forwarded to ``pd.read_csv`` when the snapshot is
+    (re)built and are part of the snapshot key.
+    """
+    offline = OFFLINE if offline is None else offline
+    data_path, manifest_path = snapshot_paths(source, **read_kwargs)
+    manifest = read_manifest(source, **read_kwargs)
+
+    if manifest is not None and data_path.exists():
+        if _local_file_changed(source, manifest):
+            # Reading a local file never touches the network, so this happens
+            # in offline mode too.
+            manifest = _revalidate(
+                source, manifest, data_path, manifest_path, read_kwargs
+            )
+            return _read_arrow(data_path)
+        if offline or not (refresh or _is_stale(manifest)):
+            return _read_arrow(data_path)
+        try:
+            manifest = _revalidate(
+                source, manifest, data_path, manifest_path, read_kwargs
+            )
+        except (urllib.error.URLError, OSError):
+            # Serve the stale snapshot rather than failing the page.
+            pass
+        return _read_arrow(data_path)
+
+    if offline:
+        raise SnapshotUnavailable(
+            f"No local snapshot of {source} in {CACHE_DIR} and offline mode is on"
+        )
+
+    stat = _local_stat(source)
+    raw, etag = _fetch(source)
+    _write_snapshot(source, raw, etag, data_path, manifest_path, read_kwargs, stat)
+    return _read_arrow(data_path)
+
+
+class SourceChunks:
+    """Iterate over ``source`` as DataFrames of at most ``chunk_rows`` rows.
+
+    Only one chunk is in memory at a time. Without a snapshot, CSV is streamed
+    from a URL or file and Parquet from a local file, and each chunk is
+    appended to a new snapshot that is kept once a full pass finishes; later
+    passes read slices of it instead of the source. ``sha256`` is the
+    fingerprint of that snapshot, known once the chunks are read.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        chunk_rows: int,
+        *,
+        offline: bool | None = None,
+        **read_kwargs,
+    ):
+        self.source = source
+        self.chunk_rows = chunk_rows
+        self.offline = OFFLINE if offline is None else offline
+        self.read_kwargs = read_kwargs
+        self.sha256 = None
+        self.etag = None
+
+    def __iter__(self):
+        data_path, manifest_path = snapshot_paths(self.source, **self.read_kwargs)
+        manifest = read_manifest(self.source, **self.read_kwargs)
+        if (
+            manifest is not None
+            and data_path.exists()
+            and not _local_file_changed(self.source, manifest)
+        ):
+            self.sha256 = manifest["sha256"]
+            yield from self._snapshot_chunks(data_path)
+            return
+
+        # A local file is read offline too, changed or not, as read_snapshot
+        # does; only a remote source needs the network.
+        stat = _local_stat(self.source)
+        if self.offline and stat is None:
+            raise SnapshotUnavailable(
+                f"No local snapshot of {self.source} in {CACHE_DIR} "
+                "and offline mode is on"
+            )
+
+        snapshot = _SnapshotWriter(data_path)
+        try:
+            if str(self.source).lower().endswith(".parquet"):
+                for table in self._parquet_tables():
+                    snapshot.write(table)
+                    yield table.to_pandas(types_mapper=_types_mapper)
+            else:
+                for chunk in self._csv_chunks():
+                    snapshot.write(pa.Table.from_pandas(chunk, preserve_index=False))
+                    yield chunk
+            snapshot.commit(
+                manifest_path,
+                _manifest(
+                    self.source,
+                    self.read_kwargs,
+                    self.etag,
+                    self.sha256,
+                    snapshot.schema,
+                    snapshot.rows,
+                    stat,
+                ),
+            )
+        finally:
+            snapshot.discard()
+
+    def _snapshot_chunks(self, data_path: Path):
+        table = pa.ipc.open_file(pa.memory_map(str(data_path))).read_all()
+        for start in range(0, table.num_rows, self.chunk_rows):
+            yield table.slice(start, self.chunk_rows).to_pandas(
+                types_mapper=_types_mapper
+            )
+
+    def _parquet_tables(self):
+        if "://" in str(self.source):
+            raise ValueError(
+                f"Parquet is only streamed from local files: {self.source}"
+            )
+        parquet_file = pq.ParquetFile(self.source)
+        for batch in parquet_file.iter_batches(batch_size=self.chunk_rows):
+            yield _cast_dates(
+                pa.Table.from_batches([batch]), self.read_kwargs.get("parse_dates", [])
+            )
+        digest = hashlib.sha256()
+        with open(self.source, "rb") as raw:
+            while block := raw.read(2**20):
+                digest.update(block)
+        self.sha256 = digest.hexdigest()
+
+    def _csv_chunks(self):
+        if "://" in str(self.source):
+            raw = urllib.request.urlopen(self.source, timeout=30)
+            self.etag = raw.headers.get("ETag")
+        else:
+            raw = open(self.source, "rb")
+        with raw:
+            hashed = _HashingReader(raw)
+            with pd.read_csv(
+                io.BufferedReader(hashed),
+                chunksize=self.chunk_rows,
+                dtype_backend="pyarrow",
+                **self.read_kwargs,
+            ) as reader:
+                yield from reader
+            while hashed.read(2**20):
+                pass
+        self.sha256 = hashed.digest.hexdigest()
+
+
+class _SnapshotWriter:
+    """Append tables to a temporary Arrow IPC file, kept only on ``commit``.
+
+    Every table is cast to the schema of the first one. Chunks are typed one
+    at a time, so a later chunk may not fit it (a column that was all null,
+    integers followed by floats); the snapshot is then dropped and the caller
+    goes on streaming without it.
+    """
+
+    def __init__(self, data_path: Path):
+        self.data_path = data_path
+        self.tmp_path = data_path.with_suffix(f"{data_path.suffix}.{os.getpid()}.tmp")
+        self.schema = None
+        self.rows = 0
+        self._writer = None
+        self._failed = False
+
+    def write(self, table: pa.Table):
+        if self._failed:
+            return
+        try:
+            if self._writer is None:
+                CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                self.schema = table.schema
+                self._writer = pa.ipc.new_file(str(self.tmp_path), self.schema)
+            elif table.schema != self.schema:
+                table = table.cast(self.schema)
+            self._writer.write_table(table)
+            self.rows += table.num_rows
+        except (pa.ArrowException, ValueError):
+            self._failed = True
+            self.discard()
+
+    def commit(self, manifest_path: Path, manifest: dict):
+        if self._failed or self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        os.replace(self.tmp_path, self.data_path)
+        _atomic_write(
+            manifest_path, json.dumps(manifest, indent=2, default=str).encode()
+        )
+
+    def discard(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self.tmp_path.unlink(missing_ok=True)
+
+
+class _HashingReader(io.RawIOBase):
+    """A readable stream that hashes the bytes read through it."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.digest = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.raw.read(len(buffer))
+        self.digest.update(data)
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def _local_stat(source: str) -> dict | None:
+    if "://" in str(source):
+        return None
+    stat = os.stat(source)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _local_file_changed(source: str, manifest: dict) -> bool:
+    try:
+        stat = _local_stat(source)
+    except OSError:
+        # The file is gone; the snapshot is all there is.
+        return False
+    return stat is not None and stat != manifest.get("stat")
+
+
+def _is_stale(manifest: dict) -> bool:
+    if not MAX_AGE:
+        return False
+    return time.time() - manifest["checked_at"] > float(MAX_AGE)
+
+
+def _fetch(source: str, etag: str | None = None) -> tuple[bytes | None, str | None]:
+    if "://" not in str(source):
+        return Path(source).read_bytes(), None
+
+    request = urllib.request.Request(source)
+    if etag:
+        request.add_header("If-None-Match", etag)
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.read(), response.headers.get("ETag")
+    except urllib.error.HTTPError as err:
+        if err.code == 304:
+            return None, etag
+        raise
+
+
+def _revalidate(source, manifest, data_path, manifest_path, read_kwargs) -> dict:
+    # A local file is stat'ed before it is read: a write racing with the read
+    # then leaves a manifest that is already out of date, not one that hides it.
+    stat = _local_stat(source)
+    raw, etag = _fetch(source, manifest.get("etag"))
+    if raw is None or hashlib.sha256(raw).hexdigest() == manifest["sha256"]:
+        manifest = {
+            **manifest,
+            "etag": etag or manifest.get("etag"),
+            "checked_at": time.time(),
+        }
+        if stat is not None:
+            manifest["stat"] = stat
+        _atomic_write(manifest_path, json.dumps(manifest, indent=2).encode())
+        return manifest
+    return _write_snapshot(
+        source, raw, etag, data_path, manifest_path, read_kwargs, stat
+    )
+
+
+def _write_snapshot(
+    source, raw, etag, data_path, manifest_path, read_kwargs, stat=None
+) -> dict:
+    table = _parse(source, raw, read_kwargs)
+
+    sink = io.BytesIO()
+    # Uncompressed so that readers can memory-map the buffers directly.
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    manifest = _manifest(
+        source,
+        read_kwargs,
+        etag,
+        hashlib.sha256(raw).hexdigest(),
+        table.schema,
+        table.num_rows,
+        stat,
+    )
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _atomic_write(data_path, sink.getvalue())
+    _atomic_write(manifest_path, json.dumps(manifest, indent=2, default=str).encode())
+    return manifest
+
+
+def _manifest(source, read_kwargs, etag, sha256, schema, rows, stat) -> dict:
+    now = time.time()
+    manifest = {
+        "source": str(source),
+        "read_kwargs": read_kwargs,
+        "etag": etag,
+        "sha256": sha256,
+        "rows": rows,
+        "schema": {field.name: str(field.type) for field in schema},
+        "fetched_at": datetime.datetime.fromtimestamp(now).isoformat(
+            timespec="seconds"
+        ),
+        "checked_at": now,
+    }
+    if stat is not None:
+        manifest["stat"] = stat
+    return manifest
+
+
+def _parse(source, raw, read_kwargs) -> pa.Table:
+    if str(source).lower().endswith(".parquet"):
+        # Parquet columns are typed already; only the dates still need to end
+        # up as the timestamps that parse_dates gives for CSV.
+        table = pq.read_table(io.BytesIO(raw))
+        return _cast_dates(table, read_kwargs.get("parse_dates", []))
+    data_df = pd.read_csv(io.BytesIO(raw), dtype_backend="pyarrow", **read_kwargs)
+    return pa.Table.from_pandas(data_df, preserve_index=False)
+
+
+def _cast_dates(table: pa.Table, columns) -> pa.Table:
+    for column in columns:
+        table = table.set_column(
+            table.schema.get_field_index(column),
+            column,
+            table[column].cast(pa.timestamp("ns")),
+        )
+    return table
+
+
+def _atomic_write(path: Path, payload: bytes):
+    tmp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, path)
+
+
+def _read_arrow(data_path: Path) -> pd.DataFrame:
+    # The returned columns keep referencing the mapped file, so pages opened by
+    # many processes share the same page cache instead of private copies.
+    table = pa.ipc.open_file(pa.memory_map(str(data_path))).read_all()
+    return table.to_pandas(types_mapper=_types_mapper)
+
+
+def _types_mapper(arrow_type: pa.DataType):
+    # Match ``pd.read_csv(..., dtype_backend="pyarrow")``: parsed dates stay
+    # numpy datetime64 columns, everything else is Arrow-backed.
+    if pa.types.is_timestamp(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
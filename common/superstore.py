@@ -0,0 +1,203 @@
+"""Data preparation for the Superstore order table used by Week 16."""
+
+import functools
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from common.aggregate import Aggregation, aggregate
+from common.downsample import lttb_indices
+from common.frames import partition_slices
+
+# Month-major, so that every month is one contiguous block of the cube.
+CUBE_KEYS = ["Year", "Month", "State", "Sub-Category"]
+CUBE_MEASURES = ["Profit", "Sales"]
+MEASURE_SUMS = {measure: "sum" for measure in CUBE_MEASURES}
+# Chunk cubes held by OrderCube.from_chunks before they are merged.
+MERGE_EVERY = 32
+
+
+def parse_currency(values: pd.Series) -> pd.Series:
+    return values.str.replace(r",|\$", "", regex=True).astype(np.float64)
+
+
+def month_start(year, month) -> np.ndarray:
+    # Month keys are turned back into dates with integer arithmetic on
+    # datetime64[M], a single vectorized cast for the whole column.
+    months = (np.asarray(year, dtype=np.int64) - 1970) * 12 + np.asarray(month) - 1
+    return months.astype("datetime64[M]").astype("datetime64[ns]")
+
+
+def normalize_orders(data_df: pd.DataFrame) -> pd.DataFrame:
+    """Build the typed order table every Week 16 view is computed from.
+
+    Sales is parsed from its ``$1,234.56`` text form exactly once, State and
+    Sub-Category become categoricals and the year/month keys of the order date
+    are precomputed as small integers.
+    """
+    order_date = data_df["Order Date"]
+    return pd.DataFrame(
+        {
+            "Order Date": order_date,
+            "Year": order_date.dt.year.astype(np.int16),
+            "Month": order_date.dt.month.astype(np.int8),
+            "State": data_df["State"].astype("category"),
+            "Sub-Category": data_df["Sub-Category"].astype("category"),
+            "Sales": parse_currency(data_df["Sales"]),
+            "Profit": data_df["Profit"].astype(np.float64),
+        }
+    )
+
+
+def build_cube(orders: pd.DataFrame) -> pd.DataFrame:
+    """Sum Sales and Profit per (State, Year, Month, Sub-Category).
+
+    Every Week 16 figure is a roll-up of this cube, which is a few thousand
+    rows no matter how many orders went into it.
+    """
+    return aggregate(orders, Aggregation(CUBE_KEYS, MEASURE_SUMS))
+
+
+def merge_cubes(*cubes: pd.DataFrame) -> pd.DataFrame:
+    """Sum cubes built from disjoint sets of orders into one cube."""
+    rows = pd.concat([cube.reset_index() for cube in cubes], ignore_index=True)
+    # Each chunk has its own categories; recode them over the union.
+    return build_cube(
+        rows.astype({"State": "category", "Sub-Category": "category"}, copy=False)
+    )
+
+
+@dataclass(frozen=True, eq=False)
+class OrderCube:
+    """The cube of ``build_cube`` and the row slice of each (Year, Month)."""
+
+    data: pd.DataFrame
+    months: dict[tuple[int, int], slice]
+
+    @classmethod
+    def from_orders(cls, orders: pd.DataFrame) -> "OrderCube":
+        return cls.from_cube(build_cube(orders))
+
+    @classmethod
+    def from_chunks(cls, chunks, merge_every: int = MERGE_EVERY) -> "OrderCube":
+        """Fold chunks of normalized orders into the cube.
+
+        Each chunk is reduced to its own small cube right away, and the
+        pending cubes are merged into the running one every ``merge_every``
+        chunks. Memory is bounded by ``merge_every`` cubes rather than the
+        number of orders, and the running cube is regrouped once per batch
+        instead of once per chunk.
+        """
+        pending = []
+        for orders in chunks:
+            pending.append(build_cube(orders))
+            if len(pending) > merge_every:
+                pending = [merge_cubes(*pending)]
+        if not pending:
+            raise ValueError("No order chunks to build the cube from")
+        cube = merge_cubes(*pending) if len(pending) > 1 else pending[0]
+        return cls.from_cube(cube)
+
+    @classmethod
+    def from_cube(cls, cube: pd.DataFrame) -> "OrderCube":
+        return cls(
+            cube, partition_slices(cube.index.to_frame(index=False), ["Year", "Month"])
+        )
+
+    def period(self, year: int | None = None, month: int | None = None):
+        """The whole cube, or the block of one month (a view, maybe empty)."""
+        if year is None:
+            return self.data
+        return self.data.iloc[self.months.get((year, month), slice(0, 0))]
+
+
+def with_profit_ratio(measures: pd.DataFrame) -> pd.DataFrame:
+    # Ratios are computed from summed measures, never summed themselves.
+    return measures.assign(Profit_Ratio=measures["Profit"] / measures["Sales"])
+
+
+def rollup_state(cube: pd.DataFrame) -> pd.DataFrame:
+    return with_profit_ratio(aggregate(cube, Aggregation(["State"], MEASURE_SUMS)))
+
+
+def rollup_state_month(cube: pd.DataFrame) -> pd.DataFrame:
+    state_month = aggregate(
+        cube, Aggregation(["State", "Year", "Month"], MEASURE_SUMS)
+    ).reset_index()
+    return with_profit_ratio(
+        state_month.loc[:, ["State"]].assign(
+            Order_Month=month_start(state_month["Year"], state_month["Month"]),
+            Profit=state_month["Profit"],
+            Sales=state_month["Sales"],
+        )
+    )
+
+
+def rollup_subcategory(
+    cube: OrderCube, states, year: int | None = None, month: int | None = None
+) -> pd.DataFrame:
+    # A month drill-down only reads that month's block of the cube.
+    return with_profit_ratio(
+        aggregate(
+            cube.period(year, month),
+            Aggregation(
+                ["State", "Sub-Category"], MEASURE_SUMS, filters={"State": states}
+            ),
+        )
+    )
+
+
+def state_slices(frame: pd.DataFrame) -> dict[str, slice]:
+    """Map each State of a State-sorted frame to its contiguous row slice."""
+    return {
+        state: rows for (state,), rows in partition_slices(frame, ["State"]).items()
+    }
+
+
+def gapped_rows(frame: pd.DataFrame, row_slices, gap_columns) -> pd.DataFrame:
+    """Concatenate row slices, each followed by a row of NaN ``gap_columns``.
+
+    Plotly breaks a line at NaN values, so one trace built from the result
+    draws every slice as its own segment.
+    """
+    row_slices = [rows for rows in row_slices if rows.stop > rows.start]
+    if not row_slices:
+        return frame.iloc[:0]
+    take = np.concatenate([np.r_[rows, rows.stop - 1] for rows in row_slices])
+    gapped = frame.iloc[take].reset_index(drop=True)
+    gap_at = np.cumsum([rows.stop - rows.start + 1 for rows in row_slices]) - 1
+    gapped.loc[gap_at, gap_columns] = np.nan
+    return gapped
+
+
+def downsample_states(
+    frame: pd.DataFrame,
+    max_points: int,
+    keep=(),
+    columns=("Sales", "Profit_Ratio"),
+) -> pd.DataFrame:
+    """Thin each State's months of a State-sorted frame with LTTB.
+
+    Every one of ``columns`` keeps ``max_points`` of its months, so a state
+    ends up with at most ``len(columns) * max_points`` rows. The states in
+    ``keep`` are left at full resolution.
+    """
+    months = frame["Order_Month"].to_numpy().astype(np.int64)
+    take = []
+    for state, rows in state_slices(frame).items():
+        index = np.arange(rows.start, rows.stop)
+        if state not in keep and len(index) > max_points:
+            index = index[
+                functools.reduce(
+                    np.union1d,
+                    [
+                        lttb_indices(
+                            months[rows], frame[column].to_numpy()[rows], max_points
+                        )
+                        for column in columns
+                    ],
+                )
+            ]
+        take.append(index)
+    return frame.iloc[np.concatenate(take)] if take else frame
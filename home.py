@@ -1,6 +1,6 @@
 import streamlit as st
 
-from pages import *
+from pages import pages_by_year, pg_home, st_page
 
 st.page_link(pg_home, label="Home", icon="🏠")
 
@@ -17,20 +17,16 @@ and *Stremalit*, replicating the original visualization as closely as possible.
 """
 )
 
-st.header(":grinning: WOW 2025", divider="rainbow")
+for year, year_pages in pages_by_year().items():
+    st.header(f":grinning: WOW {year}", divider="rainbow")
 
-row1 = st.columns(7)
-with row1[0]:
-    st.page_link(
-        pg_wow25week15,
-        label="**Week 15**",
-        icon="📅",
-        help="Open Week 15 challenge",
-    )
-with row1[1]:
-    st.page_link(
-        pg_wow25week16,
-        label="**Week 16**",
-        icon="📅",
-        help="Open Week 16 challenge",
-    )
+    for row_start in range(0, len(year_pages), 7):
+        row = st.columns(7)
+        for col, page in zip(row, year_pages[row_start : row_start + 7]):
+            with col:
+                st.page_link(
+                    st_page(page),
+                    label=f"**Week {page.week}**",
+                    icon=page.icon,
+                    help=f"Open Week {page.week} challenge",
+                )
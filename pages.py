@@ -1,16 +1,112 @@
+import ast
+import functools
+import types
+from dataclasses import dataclass
+from pathlib import Path
+
 import streamlit as st
 
-pg_home = st.Page("home.py", title="Home", icon="🏠")
+ROOT = Path(__file__).resolve().parent
+PAGE_GLOB = "wow/*/week_*.py"
+
+
+def __getattr__(name):
+    # ``pg_home`` is built on access: outside of a script run (e.g. when the
+    # warm-up imports this module) st.Page returns an unusable page.
+    if name == "pg_home":
+        return st.Page("home.py", title="Home", icon="🏠")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@dataclass(frozen=True)
+class PageInfo:
+    path: str
+    year: int
+    week: int
+    title: str
+    icon: str = "📅"
+    url_path: str | None = None
+    datasets: tuple[str, ...] = ()
+
+
+def read_page_metadata(path: Path) -> dict:
+    """Return the literal ``PAGE`` dict of a week module without importing it."""
+    for node in ast.parse(path.read_text(encoding="utf-8")).body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "PAGE"
+            for target in node.targets
+        ):
+            return ast.literal_eval(node.value)
+    raise ValueError(f"{path} does not define a PAGE metadata dict")
+
+
+def load_page_module(path: Path, name: str | None = None) -> types.ModuleType:
+    """Execute only the definitions of a week module, not the page itself.
+
+    Imports, functions, classes and literal constants are kept; widgets,
+    session state and the page body are dropped. The cached functions keep
+    their decorators, the undecorated function is their ``__wrapped__``.
+
+    The module is named ``wow_<year>_<week>`` unless ``name`` is given.
+    Streamlit runs pages as ``__main__`` and ``st.cache_resource`` keys on the
+    module name, so pass ``"__main__"`` to share the page's cache entries.
+    """
+    tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    body = [node for node in tree.body if _is_definition(node)]
+    module = types.ModuleType(name or f"wow_{path.parent.name}_{path.stem}")
+    module.__file__ = str(path)
+    code = compile(ast.Module(body=body, type_ignores=[]), str(path), "exec")
+    exec(code, module.__dict__)
+    return module
+
+
+def _is_definition(node: ast.stmt) -> bool:
+    if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef)):
+        return True
+    if isinstance(node, ast.Assign):
+        try:
+            ast.literal_eval(node.value)
+        except ValueError:
+            return False
+        return True
+    return False
+
+
+@functools.cache
+def discover_pages() -> tuple[PageInfo, ...]:
+    # Parsed once per process; the week modules themselves (and their pandas,
+    # plotly and data loading) only run when a user opens the page.
+    pages = []
+    for path in ROOT.glob(PAGE_GLOB):
+        metadata = read_page_metadata(path)
+        pages.append(
+            PageInfo(
+                path=path.relative_to(ROOT).as_posix(),
+                year=int(path.parent.name),
+                week=int(path.stem.removeprefix("week_")),
+                title=metadata["title"],
+                icon=metadata.get("icon", PageInfo.icon),
+                url_path=metadata.get("url_path"),
+                datasets=tuple(metadata.get("datasets", ())),
+            )
+        )
+    return tuple(sorted(pages, key=lambda page: (page.year, page.week)))
+
+
+def pages_by_year() -> dict[int, list[PageInfo]]:
+    years = {}
+    for page in discover_pages():
+        years.setdefault(page.year, []).append(page)
+    return years
+
+
+def st_page(page: PageInfo):
+    kwargs = {"url_path": page.url_path} if page.url_path else {}
+    return st.Page(page.path, title=page.title, icon=page.icon, **kwargs)
 
-pg_wow25week15 = st.Page(
-    "wow/2025/week_15.py",
-    title="Week 15 - Population Pyramid",
-    icon="📅",
-    url_path="wow25week15",
-)
 
-pg_wow25week16 = st.Page(
-    "wow/2025/week_16.py",
-    title="Week 16 - Dynamic Zone Visibility",
-    icon="📅",
-)
\ No newline at end of file
+def navigation_sections() -> dict[str, list]:
+    return {
+        f"Workout Wednesday {year}": [st_page(page) for page in pages]
+        for year, pages in pages_by_year().items()
+    }
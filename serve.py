@@ -0,0 +1,33 @@
+"""The app with its caches warmed up when the server starts::
+
+    streamlit run serve.py
+
+``GET /ready`` answers 503 until the warm-up (``warmup``) finished, then 200
+with its report: point the load balancer's health check at it, so that only
+warm replicas get traffic. ``streamlit run streamlit_app.py`` serves the same
+app without warming up.
+"""
+
+from contextlib import asynccontextmanager
+
+import streamlit as st
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import warmup
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Before yielding: the server runs no script yet, see warmup.start.
+    warmup.start()
+    yield
+
+
+async def ready(request):
+    return JSONResponse(
+        warmup.REPORT, status_code=200 if warmup.READY.is_set() else 503
+    )
+
+
+app = st.App("streamlit_app.py", lifespan=lifespan, routes=[Route("/ready", ready)])
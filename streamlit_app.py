@@ -1,13 +1,10 @@
 import streamlit as st
 
-from pages import *
+from pages import navigation_sections, pg_home
 
 pages = {
     "": [pg_home],
-    "Workout Wednesday 2025": [
-        pg_wow25week15,
-        pg_wow25week16,
-    ],
+    **navigation_sections(),
 }
 
 pg = st.navigation(pages)
@@ -0,0 +1,196 @@
+"""Fill the caches before the first visitor does.
+
+::
+
+    streamlit run serve.py    # the app, warmed up when the server starts
+    python -m warmup          # the same warm-up once, from the command line
+
+Every page's default selection is rendered in this process, through the
+page's own cached functions, so that the Streamlit caches (the loaded data)
+are filled too. The popular selections (``warmup.selections``), e.g. every
+Week 15 country in the latest year, are rendered in a pool of worker
+processes; the figures and aggregates they cache are copied into this
+process's ``common.cache.CACHE``. From the command line, only the local
+snapshots (``common.snapshot``) outlast the run.
+
+Environment variables:
+
+- ``WOW_WARMUP_POPULAR``: pages whose popular selections are warmed up, e.g.
+  ``week_15,2025/week_16``; ``all`` (default), or empty for the defaults only.
+- ``WOW_WARMUP_WORKERS``: worker processes (default: one per CPU).
+
+The popular selections share ``WOW_CACHE_BUDGET_MB`` with what visitors add
+later; the report counts the entries evicted while warming up.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import cache
+
+from common.cache import CACHE
+from common.snapshot import configured_source
+from pages import ROOT, discover_pages, load_page_module
+from warmup.selections import PLANS
+
+POPULAR = os.environ.get("WOW_WARMUP_POPULAR", "all")
+WORKERS = int(os.environ.get("WOW_WARMUP_WORKERS") or 0) or os.cpu_count() or 1
+
+# Page code run outside of a script run, as here, makes Streamlit warn about
+# the missing ScriptRunContext on every cached call.
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(
+    logging.ERROR
+)
+
+# Set once the warm-up finished; REPORT then holds its outcome.
+READY = threading.Event()
+REPORT: dict = {"ready": False}
+
+
+@cache
+def load_page(path: str):
+    """The page module of ``path`` and the sources of its datasets."""
+    # Named like the page Streamlit runs, to share its st.cache_resource entries.
+    page = load_page_module(ROOT / path, "__main__")
+    info = next(info for info in discover_pages() if info.path == path)
+    sources = {
+        dataset: configured_source(dataset, page.DATA_SOURCE)
+        for dataset in info.datasets
+    }
+    return page, sources
+
+
+def popular_pages(popular: str) -> list[str]:
+    names = [name.strip() for name in popular.split(",") if name.strip()]
+    return [
+        info.path
+        for info in discover_pages()
+        if info.path in PLANS
+        and ("all" in names or any(name in info.path for name in names))
+    ]
+
+
+def render(path: str, selection: dict):
+    page, sources = load_page(path)
+    _, render_selection = PLANS[path]
+    render_selection(page, sources, **selection)
+
+
+def render_shard(path: str, shard: int, shards: int) -> list:
+    """Render every ``shards``-th popular selection of a page, in a worker.
+
+    Returns the cache entries the selections added, to be copied into the
+    server's cache.
+    """
+    page, sources = load_page(path)
+    list_selections, _ = PLANS[path]
+    default, *popular = list_selections(page, sources)
+    added = []
+    for selection in popular[shard::shards]:
+        if selection == default:
+            continue
+        before = {key for key, _ in CACHE.items()}
+        render(path, selection)
+        added += [(key, entry) for key, entry in CACHE.items() if key not in before]
+    return added
+
+
+def submit_popular(pool: ProcessPoolExecutor, paths: list[str], shards: int):
+    return {
+        path: [
+            pool.submit(render_shard, path, shard, shards) for shard in range(shards)
+        ]
+        for path in paths
+    }
+
+
+def worker_pool(workers: int) -> ProcessPoolExecutor:
+    # Spawned, not forked: the server process runs threads that hold locks.
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def warm_up(
+    popular: str = POPULAR,
+    workers: int = WORKERS,
+    futures: dict[str, list[Future]] | None = None,
+) -> dict:
+    """Render the defaults here and the popular selections in a worker pool.
+
+    ``futures`` are popular shards submitted already, see ``start``. Returns
+    the report, also kept in ``REPORT``; ``READY`` is set when done, even if a
+    page failed, as a replica that is cold for one page still serves.
+    """
+    start = time.perf_counter()
+    evictions = CACHE.evictions
+    report = {"ready": False, "pages": {}}
+    paths = [info.path for info in discover_pages() if info.path in PLANS]
+
+    pool = None
+    if futures is None:
+        pool = worker_pool(workers)
+        futures = submit_popular(pool, popular_pages(popular), workers)
+    try:
+        for path in paths:
+            page_report = report["pages"][path] = {}
+            page_start = time.perf_counter()
+            try:
+                page, sources = load_page(path)
+                list_selections, _ = PLANS[path]
+                render(path, list_selections(page, sources)[0])
+            except Exception as exc:
+                page_report["error"] = repr(exc)
+            page_report["default_s"] = round(time.perf_counter() - page_start, 3)
+
+        for path, shards in futures.items():
+            page_report = report["pages"][path]
+            page_report["popular_entries"] = 0
+            for shard in shards:
+                try:
+                    entries = shard.result()
+                except Exception as exc:
+                    page_report["error"] = repr(exc)
+                    continue
+                for key, entry in entries:
+                    CACHE.put(key, entry.function, entry.value, entry.priority)
+                page_report["popular_entries"] += len(entries)
+            # Since the start: the shards ran alongside the defaults.
+            page_report["popular_done_s"] = round(time.perf_counter() - start, 3)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    report.update(
+        ready=True,
+        seconds=round(time.perf_counter() - start, 3),
+        cache_bytes=CACHE.size,
+        cache_budget_bytes=CACHE.budget_bytes,
+        cache_evictions=CACHE.evictions - evictions,
+    )
+    REPORT.clear()
+    REPORT.update(report)
+    READY.set()
+    return report
+
+
+def start(popular: str = POPULAR, workers: int = WORKERS) -> threading.Thread:
+    """Warm up in the background of a starting server.
+
+    The popular selections are submitted to the pool right away: a spawned
+    worker re-imports the parent's ``__main__``, which is a page once the
+    server runs scripts.
+    """
+    pool = worker_pool(workers)
+    futures = submit_popular(pool, popular_pages(popular), workers)
+
+    def run():
+        try:
+            warm_up(popular, workers, futures)
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,30 @@
+import argparse
+import json
+from pathlib import Path
+
+import warmup
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m warmup")
+    parser.add_argument(
+        "--popular",
+        default=warmup.POPULAR,
+        metavar="NAMES",
+        help="pages whose popular selections to render, e.g. week_15 or all; "
+        "empty for the defaults only",
+    )
+    parser.add_argument("--workers", type=int, default=warmup.WORKERS)
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = warmup.warm_up(args.popular, args.workers)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    print(text)
+    return 1 if any("error" in page for page in report["pages"].values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,52 @@
+"""The selections of each week page that the warm-up renders.
+
+For every page, one function lists the selections, the default (what a first
+visit renders) first and then the popular ones; another renders a selection
+by calling the page's cached functions the way the page body does.
+"""
+
+from types import ModuleType
+
+from common.dag import run_dag
+
+
+def week_15_selections(page: ModuleType, sources: dict[str, str]) -> list[dict]:
+    data_handle = page.load_data(sources["eu27_population"])
+    countries = data_handle.data.countries
+    years = data_handle.data.years
+    default = dict(
+        country1=countries[14], year1=years[-1], country2=countries[0], year2=years[-1]
+    )
+    # Every country in the latest year, against the default reference.
+    return [default] + [{**default, "country1": country} for country in countries]
+
+
+def week_15(
+    page: ModuleType, sources: dict[str, str], country1, year1, country2, year2
+):
+    data_handle = page.load_data(sources["eu27_population"])
+    filtered_handles = page.filter_data(data_handle, country1, year1, country2, year2)
+    page.plot_template()
+    page.plot(*filtered_handles)
+
+
+def week_16_selections(page: ModuleType, sources: dict[str, str]) -> list[dict]:
+    cube_handle = page.load_data(sources["superstore_orders"], page.STREAM_ROWS)
+    profit_handle = page.transform_data(cube_handle)
+    # Every state clicked in the scatter, which updates all four charts.
+    return [{"state": "Pennsylvania"}] + [
+        {"state": state} for state in profit_handle.data.index
+    ]
+
+
+def week_16(page: ModuleType, sources: dict[str, str], state):
+    cube_handle = page.load_data(sources["superstore_orders"], page.STREAM_ROWS)
+    tasks = page.figure_tasks(cube_handle, state, state, -1, None, None)
+    run_dag(tasks, tasks, workers=1)
+
+
+# Keyed by page path, as discovered by pages.discover_pages().
+PLANS = {
+    "wow/2025/week_15.py": (week_15_selections, week_15),
+    "wow/2025/week_16.py": (week_16_selections, week_16),
+}
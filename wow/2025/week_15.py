@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 
 import plotly.graph_objects as go
@@ -7,6 +6,20 @@ import plotly.graph_objects as go
 import inspect
 
 from pages import pg_home
+from common.cache import FIGURE, bounded_cache
+from common.charts import figure_spec, plotly_chart
+from common.handles import HASH_FUNCS, DatasetHandle, dataset_handle
+from common.metrics import instrumented, metrics_panel, timed
+from common.population import PopulationTable, prepare_population
+from common.snapshot import configured_source, read_snapshot, snapshot_fingerprint
+
+# Read by pages.py without importing this module.
+PAGE = {
+    "title": "Week 15 - Population Pyramid",
+    "icon": "📅",
+    "url_path": "wow25week15",
+    "datasets": ["eu27_population"],
+}
 
 st.page_link(pg_home, label="Home", icon="🏠")
 
@@ -16,137 +29,83 @@ st.markdown("#### Visualize the population by age and gender in a population pyr
 DATA_SOURCE = "https://gitee.com/chenyulue/data_samples/raw/main/wow/EU27_population_2015-2024.CSV"
 
 
-@st.cache_data
-def load_data(data_source):
-    data_df = pd.read_csv(data_source, dtype_backend="pyarrow")
-
-    ages = data_df["Age"].str.extract(r"(?P<age>\d+)").astype(int)
-    age_rank = np.where(
-        ages < 15, "Young", np.where(ages < 65, "Active population", "Elders")
-    )
-
-    population_total = (
-        data_df.loc[:, ["Country", "Year", "Male", "Female"]]
-        .groupby(["Country", "Year"])
-        .sum()
-        .sum(axis=1)
-        .reset_index()
-        .reset_index()
-        .rename(columns={0: "Total"})
+@instrumented(st.cache_resource)
+def load_data(data_source) -> DatasetHandle:
+    data_df = prepare_population(read_snapshot(data_source))
+    return dataset_handle(
+        "eu27_population",
+        PopulationTable.from_frame(data_df),
+        snapshot_fingerprint(data_source),
     )
 
-    data_df_total = data_df.merge(population_total, on=["Country", "Year"])
-    data_df_total = data_df_total.assign(
-        Age_Rank=age_rank,
-        Male_Ratio=data_df_total["Male"] / data_df_total["Total"],
-        Female_Ratio=data_df_total["Female"] / data_df_total["Total"],
+@instrumented()
+def filter_data(data_handle, country1, year1, country2, year2):
+    # Partition lookups return views, cheaper than a cache round trip.
+    population = data_handle.data
+    data_filtered = population.pyramid(country1, year1)
+    data_filtered_ref = population.pyramid(country2, year2)
+    return (
+        data_handle.derive("filtered", data_filtered, country1, year1),
+        data_handle.derive("filtered", data_filtered_ref, country2, year2),
     )
-    return data_df_total
-
-@st.cache_data
-def filter_data(data_df, country1, year1, country2, year2):
-    data_filtered = data_df.query("Country == @country1 and Year == @year1")
-    data_filtered_ref = data_df.query("Country == @country2 and Year == @year2")
-    return data_filtered, data_filtered_ref
-
-@st.cache_data
-def plot(data_filtered, data_filtered_ref):
-    female_colors = {
-        "Elders": "#c46487",
-        "Active population": "#D18EB0",
-        "Young": "#DBB5D3",
-    }
-    male_colors = {
-        "Elders": "#27aab0",
-        "Active population": "#60BEBC",
-        "Young": "#96D0C7",
-    }
-    line_color = "#632538"
-    grid_color = "#F2F2F2"
 
-    x_range = np.arange(-1, 1.1, 0.1) / 100
+female_colors = {
+    "Elders": "#c46487",
+    "Active population": "#D18EB0",
+    "Young": "#DBB5D3",
+}
+male_colors = {
+    "Elders": "#27aab0",
+    "Active population": "#60BEBC",
+    "Young": "#96D0C7",
+}
+line_color = "#632538"
+grid_color = "#F2F2F2"
 
-    data_custom = pd.concat(
-        [
-            data_filtered.reset_index(drop=True),
-            data_filtered_ref.reset_index(drop=True).rename(columns=lambda x: f"{x}2"),
-        ],
-        axis=1,
-    )
 
-    hover_template = (
-        "%{customdata[2]} <br>"
-        "(%{customdata[7]})<br><br>"
-        "<span style='fontsize:12px;font-weight:bold'>%{customdata[0]} - %{customdata[1]}</span><br>"
-        "<span style='color:#c46487'>Female</span>: %{customdata[4]:,}<br>"
-        "%{customdata[9]:.1%} of total population<br>"
-        "<span style='color:#27aab0'>Male</span>: %{customdata[3]:,}<br>"
-        "%{customdata[8]:.1%} of total population<br><br>"
-        "<span style='fontsize:12px;font-weight:bold'>%{customdata[10]} - %{customdata[11]}</span><br>"
-        "<span style='color:#c46487'>Female</span>: %{customdata[14]:,}<br>"
-        "%{customdata[19]:.1%} of total population<br>"
-        "<span style='color:#27aab0'>Male</span>: %{customdata[13]:,}<br>"
-        "%{customdata[18]:.1%} of total population<br><br>"
-        "<extra></extra>"
-    )
+@instrumented(st.cache_resource)
+def plot_template():
+    # Everything that does not depend on the selection is built and validated
+    # once; plot() only fills in the data arrays and the legend texts.
+    x_range = np.arange(-1, 1.1, 0.1) / 100
 
     fig = go.Figure()
     fig.add_traces(
         [
             go.Bar(
                 name="Female",
-                x=data_filtered["Female_Ratio"],
-                y=data_filtered["Age"],
                 orientation="h",
-                marker=dict(
-                    color=[female_colors[age] for age in data_filtered["Age_Rank"]],
-                ),
+                textposition="none",
                 showlegend=False,
-                customdata=data_custom,
-                hovertemplate=hover_template,
                 hoverlabel=dict(
                     bgcolor="white",
                 ),
             ),
             go.Bar(
                 name="Male",
-                x=-data_filtered["Male_Ratio"],
-                y=data_filtered["Age"],
                 orientation="h",
-                marker=dict(
-                    color=[male_colors[age] for age in data_filtered["Age_Rank"]],
-                ),
+                textposition="none",
                 showlegend=False,
-                customdata=data_custom,
-                hovertemplate=hover_template,
                 hoverlabel=dict(
                     bgcolor="white",
                 ),
             ),
             go.Scatter(
-                x=data_filtered_ref["Female_Ratio"],
-                y=data_filtered_ref["Age"],
                 mode="lines",
                 line=dict(
                     color=line_color,
                 ),
                 showlegend=False,
-                customdata=data_custom,
-                hovertemplate=hover_template,
                 hoverlabel=dict(
                     bgcolor="white",
                 ),
             ),
             go.Scatter(
-                x=-data_filtered_ref["Male_Ratio"],
-                y=data_filtered_ref["Age"],
                 mode="lines",
                 line=dict(
                     color=line_color,
                 ),
                 showlegend=False,
-                customdata=data_custom,
-                hovertemplate=hover_template,
                 hoverlabel=dict(
                     bgcolor="white",
                 ),
@@ -170,7 +129,6 @@ def plot(data_filtered, data_filtered_ref):
         yaxis=dict(
             ticks="",
             showticklabels=False,
-            range=[-1, len(data_filtered)],
         ),
         margin=dict(
             t=120,
@@ -226,15 +184,7 @@ def plot(data_filtered, data_filtered_ref):
     ann_height = 80
 
     fig.add_annotation(
-        text=(
-            "<b>Male</b><br>"
-            f"<b>{data_filtered['Country'].iloc[0]}-{data_filtered['Year'].iloc[0]}</b>  "
-            f"<span style='color:{male_colors['Elders']}'>■</span> Elders<br>"
-            f"<span style='color:{male_colors['Active population']}'>■</span> Active population "
-            f"<span style='color:{male_colors['Young']}'>■</span> Young<br>"
-            f"<b>{data_filtered_ref['Country'].iloc[0]}-{data_filtered_ref['Year'].iloc[0]}</b> "
-            f"<span style='color:{line_color}'>─</span>"
-        ),
+        text="",
         xref="x domain",
         x=0.25,
         xanchor="right",
@@ -249,15 +199,7 @@ def plot(data_filtered, data_filtered_ref):
         height=ann_height,
     )
     fig.add_annotation(
-        text=(
-            "<b>Female</b><br>"
-            f"<b>{data_filtered['Country'].iloc[0]}-{data_filtered['Year'].iloc[0]}</b>  "
-            f"<span style='color:{female_colors['Elders']}'>■</span> Elders<br>"
-            f"<span style='color:{female_colors['Active population']}'>■</span> Active population "
-            f"<span style='color:{female_colors['Young']}'>■</span> Young<br>"
-            f"<b>{data_filtered_ref['Country'].iloc[0]}-{data_filtered_ref['Year'].iloc[0]}</b> "
-            f"<span style='color:{line_color}'>─</span>"
-        ),
+        text="",
         xref="x domain",
         x=1,
         xanchor="right",
@@ -273,11 +215,7 @@ def plot(data_filtered, data_filtered_ref):
     )
 
     fig.add_annotation(
-        text=(
-            "Total Population<br>"
-            f"<b>{data_filtered['Country'].iloc[0]}-{data_filtered['Year'].iloc[0]}</b>:<br><br>"
-            f"<span style='font-size:18px'>{data_filtered['Total'].iloc[0]:,.0f}</span>"
-        ),
+        text="",
         xref="x domain",
         x=0.5,
         xanchor="right",
@@ -292,11 +230,7 @@ def plot(data_filtered, data_filtered_ref):
         height=ann_height,
     )
     fig.add_annotation(
-        text=(
-            "Total Population<br>"
-            f"<b>{data_filtered_ref['Country'].iloc[0]}-{data_filtered_ref['Year'].iloc[0]}</b>:<br><br>"
-            f"<span style='font-size:18px'>{data_filtered_ref['Total'].iloc[0]:,.0f}</span>"
-        ),
+        text="",
         xref="x domain",
         x=0.75,
         xanchor="right",
@@ -310,12 +244,241 @@ def plot(data_filtered, data_filtered_ref):
         width=ann_width,
         height=ann_height,
     )
-    return fig
+    return fig.to_dict()
 
-data_df_total = load_data(DATA_SOURCE)
 
-countries = np.sort(data_df_total["Country"].unique())
-years = np.sort(data_df_total["Year"].unique())
+def legend_texts(data_filtered, data_filtered_ref):
+    label = f"{data_filtered['Country'].iloc[0]}-{data_filtered['Year'].iloc[0]}"
+    label_ref = (
+        f"{data_filtered_ref['Country'].iloc[0]}-{data_filtered_ref['Year'].iloc[0]}"
+    )
+    return [
+        (
+            "<b>Male</b><br>"
+            f"<b>{label}</b>  "
+            f"<span style='color:{male_colors['Elders']}'>■</span> Elders<br>"
+            f"<span style='color:{male_colors['Active population']}'>■</span> Active population "
+            f"<span style='color:{male_colors['Young']}'>■</span> Young<br>"
+            f"<b>{label_ref}</b> "
+            f"<span style='color:{line_color}'>─</span>"
+        ),
+        (
+            "<b>Female</b><br>"
+            f"<b>{label}</b>  "
+            f"<span style='color:{female_colors['Elders']}'>■</span> Elders<br>"
+            f"<span style='color:{female_colors['Active population']}'>■</span> Active population "
+            f"<span style='color:{female_colors['Young']}'>■</span> Young<br>"
+            f"<b>{label_ref}</b> "
+            f"<span style='color:{line_color}'>─</span>"
+        ),
+        (
+            "Total Population<br>"
+            f"<b>{label}</b>:<br><br>"
+            f"<span style='font-size:18px'>{data_filtered['Total'].iloc[0]:,.0f}</span>"
+        ),
+        (
+            "Total Population<br>"
+            f"<b>{label_ref}</b>:<br><br>"
+            f"<span style='font-size:18px'>{data_filtered_ref['Total'].iloc[0]:,.0f}</span>"
+        ),
+    ]
+
+
+def hover_template(data_filtered, data_filtered_ref):
+    # Country and year are the same for every row, so they are written into
+    # the template; the age is the y value and its rank the trace text. Only
+    # the counts and ratios travel as (typed, numeric) customdata.
+    return (
+        "%{y} <br>"
+        "(%{text})<br><br>"
+        f"<span style='fontsize:12px;font-weight:bold'>{data_filtered['Country'].iloc[0]} - {data_filtered['Year'].iloc[0]}</span><br>"
+        "<span style='color:#c46487'>Female</span>: %{customdata[0]:,}<br>"
+        "%{customdata[1]:.1%} of total population<br>"
+        "<span style='color:#27aab0'>Male</span>: %{customdata[2]:,}<br>"
+        "%{customdata[3]:.1%} of total population<br><br>"
+        f"<span style='fontsize:12px;font-weight:bold'>{data_filtered_ref['Country'].iloc[0]} - {data_filtered_ref['Year'].iloc[0]}</span><br>"
+        "<span style='color:#c46487'>Female</span>: %{customdata[4]:,}<br>"
+        "%{customdata[5]:.1%} of total population<br>"
+        "<span style='color:#27aab0'>Male</span>: %{customdata[6]:,}<br>"
+        "%{customdata[7]:.1%} of total population<br><br>"
+        "<extra></extra>"
+    )
+
+
+HOVER_COLUMNS = ["Female", "Female_Ratio", "Male", "Male_Ratio"]
+
+
+def pyramid_figure(data_filtered, data_filtered_ref):
+    template = plot_template()
+
+    # One typed array holds counts and ratios alike, so it is float64: float32
+    # is exact for counts only up to 2**24, short of a large country's ages.
+    data_custom = np.column_stack(
+        [data_filtered[column].to_numpy() for column in HOVER_COLUMNS]
+        + [data_filtered_ref[column].to_numpy() for column in HOVER_COLUMNS]
+    ).astype(np.float64)
+    hover = dict(
+        hovertemplate=hover_template(data_filtered, data_filtered_ref),
+        text=data_filtered["Age_Rank"].to_numpy(),
+        customdata=data_custom,
+    )
+    ages = data_filtered["Age"].to_numpy()
+    ages_ref = data_filtered_ref["Age"].to_numpy()
+
+    female_bar, male_bar, female_line, male_line = template["data"]
+    data = [
+        {
+            **female_bar,
+            "x": data_filtered["Female_Ratio"].to_numpy(),
+            "y": ages,
+            "marker": {
+                "color": [female_colors[age] for age in data_filtered["Age_Rank"]]
+            },
+            **hover,
+        },
+        {
+            **male_bar,
+            "x": -data_filtered["Male_Ratio"].to_numpy(),
+            "y": ages,
+            "marker": {
+                "color": [male_colors[age] for age in data_filtered["Age_Rank"]]
+            },
+            **hover,
+        },
+        {
+            **female_line,
+            "x": data_filtered_ref["Female_Ratio"].to_numpy(),
+            "y": ages_ref,
+            **hover,
+        },
+        {
+            **male_line,
+            "x": -data_filtered_ref["Male_Ratio"].to_numpy(),
+            "y": ages_ref,
+            **hover,
+        },
+    ]
+
+    annotations = template["layout"]["annotations"]
+    layout = {
+        **template["layout"],
+        "yaxis": {**template["layout"]["yaxis"], "range": [-1, len(data_filtered)]},
+        "annotations": annotations[:3]
+        + [
+            {**annotation, "text": text}
+            for annotation, text in zip(
+                annotations[3:], legend_texts(data_filtered, data_filtered_ref)
+            )
+        ],
+    }
+    return data, layout
+
+
+@instrumented(bounded_cache(priority=FIGURE, hash_funcs=HASH_FUNCS))
+def plot(filtered_handle, filtered_ref_handle):
+    data, layout = pyramid_figure(filtered_handle.data, filtered_ref_handle.data)
+    # The template was validated when it was built, so skip Plotly's
+    # validators for the per-selection figure.
+    return figure_spec(go.Figure(data=data, layout=layout, _validate=False))
+
+
+FRAME_ANIMATION = {
+    "mode": "immediate",
+    "frame": {"duration": 0, "redraw": True},
+    "transition": {"duration": 0},
+}
+
+
+@instrumented(bounded_cache(priority=FIGURE, hash_funcs=HASH_FUNCS))
+def plot_years(data_handle, country1, year1, filtered_ref_handle):
+    # Every year of Country1 as an animation frame, so scrubbing the years
+    # happens in the browser; Year1 is the frame shown first.
+    population = data_handle.data
+    years = population.years
+    figures = [
+        pyramid_figure(population.pyramid(country1, year), filtered_ref_handle.data)
+        for year in years
+    ]
+    first_data, first_layout = figures[years.index(year1)]
+
+    # Frames only carry the trace values that differ between years, e.g.
+    # not the reference lines; the rest stays as first drawn.
+    changing = [
+        [
+            key
+            for key in trace
+            if not all(np.array_equal(trace[key], data[i][key]) for data, _ in figures)
+        ]
+        for i, trace in enumerate(first_data)
+    ]
+    frames = [
+        dict(
+            name=str(year),
+            data=[
+                {key: trace[key] for key in keys} for trace, keys in zip(data, changing)
+            ],
+            layout=dict(yaxis=layout["yaxis"], annotations=layout["annotations"]),
+        )
+        for year, (data, layout) in zip(years, figures)
+    ]
+
+    layout = {
+        **first_layout,
+        "margin": {**first_layout["margin"], "b": 180},
+        "sliders": [
+            dict(
+                active=years.index(year1),
+                steps=[
+                    dict(
+                        label=str(year),
+                        method="animate",
+                        args=[[str(year)], FRAME_ANIMATION],
+                    )
+                    for year in years
+                ],
+                currentvalue=dict(prefix=f"{country1} - "),
+                x=0.1,
+                len=0.9,
+                y=0,
+                yanchor="top",
+                pad=dict(t=90),
+            )
+        ],
+        "updatemenus": [
+            dict(
+                type="buttons",
+                showactive=False,
+                x=0.1,
+                xanchor="right",
+                y=0,
+                yanchor="top",
+                pad=dict(t=140, r=10),
+                buttons=[
+                    dict(
+                        label="▶",
+                        method="animate",
+                        args=[
+                            None,
+                            {
+                                **FRAME_ANIMATION,
+                                "frame": {"duration": 600, "redraw": True},
+                                "fromcurrent": True,
+                            },
+                        ],
+                    )
+                ],
+            )
+        ],
+    }
+    return figure_spec(
+        go.Figure(data=first_data, layout=layout, frames=frames, _validate=False)
+    )
+
+
+data_handle = load_data(configured_source("eu27_population", DATA_SOURCE))
+
+countries = data_handle.data.countries
+years = data_handle.data.years
 
 cols = st.columns(4)
 with cols[0]:
@@ -327,12 +490,28 @@ with cols[2]:
 with cols[3]:
     Year2 = st.selectbox("**Year2**", years, index=len(years) - 1)
 
-data_filtered, data_filtered_ref = filter_data(
-    data_df_total, Country1, Year1, Country2, Year2
+animate = st.toggle(
+    "**Animate Year1**",
+    help="Send all years of Country1 at once and scrub through them in the chart.",
+)
+
+filtered_handle, filtered_ref_handle = filter_data(
+    data_handle, Country1, Year1, Country2, Year2
 )
 
-fig = plot(data_filtered, data_filtered_ref)
-st.plotly_chart(fig, theme=None, use_container_width=True)
+if animate:
+    fig = plot_years(data_handle, Country1, Year1, filtered_ref_handle)
+else:
+    fig = plot(filtered_handle, filtered_ref_handle)
+with timed("week_15.plotly_chart"):
+    plotly_chart(fig, theme=None, width="stretch")
 
 with st.expander("See the plot code"):
-    st.code(inspect.getsource(plot))
\ No newline at end of file
+    st.code(
+        "\n\n".join(
+            inspect.getsource(func)
+            for func in [plot_template, pyramid_figure, plot_years if animate else plot]
+        )
+    )
+
+metrics_panel()
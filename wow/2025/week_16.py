@@ -10,6 +10,35 @@ from plotly.subplots import make_subplots
 # st.set_page_config(layout="wide")
 
 from pages import pg_home
+from common.cache import AGGREGATE, FIGURE, bounded_cache
+from common.charts import figure_spec, plotly_chart
+from common.dag import Ref, Task, run_dag
+from common.handles import HASH_FUNCS, DatasetHandle, dataset_handle
+from common.metrics import METRICS_FRAGMENT, instrumented, metrics_panel, timed
+from common.snapshot import (
+    STREAM_ROWS,
+    SourceChunks,
+    configured_source,
+    read_snapshot,
+    snapshot_fingerprint,
+)
+from common.superstore import (
+    OrderCube,
+    downsample_states,
+    gapped_rows,
+    normalize_orders,
+    rollup_state,
+    rollup_state_month,
+    rollup_subcategory,
+    state_slices,
+)
+
+# Read by pages.py without importing this module.
+PAGE = {
+    "title": "Week 16 - Dynamic Zone Visibility",
+    "icon": "📅",
+    "datasets": ["superstore_orders"],
+}
 
 st.page_link(pg_home, label="Home", icon="🏠")
 
@@ -32,28 +61,45 @@ DATA_SOURCE = (
     "https://gitee.com/chenyulue/data_samples/raw/main/wow/Sample-Superstore_Orders.csv"
 )
 
-
-@st.cache_data
-def load_data() -> pd.DataFrame:
-    return pd.read_csv(DATA_SOURCE, parse_dates=["Order Date"], dtype_backend="pyarrow")
-
-
-@st.cache_data
-def transform_data(data_df: pd.DataFrame) -> pd.DataFrame:
-    profit_ratio_vs_sales = (
-        data_df.loc[:, ["State", "Profit"]]
-        .assign(
-            Sales=data_df["Sales"]
-            .str.replace(r",|\$", "", regex=True)
-            .astype(np.float64)
-        )
-        .groupby("State")
-        .sum()
+# Draw the monthly lines as one NaN-separated trace per line style instead of
+# two traces per state. Smaller figure JSON and faster rendering in the browser
+# when the reference box holds many states.
+MERGE_LINE_TRACES = False
+
+# Highlight the selected state in the scatter with Plotly's selection styles,
+# which the browser applies on click, instead of rebuilding and resending the
+# scatter for every selected state. The other charts still rerun, as their
+# data depends on the state.
+HIGHLIGHT_IN_BROWSER = False
+
+# Draw the monthly lines with WebGL once they hold more points than this;
+# SVG markers get slow to draw and hover in the thousands.
+WEBGL_POINTS = 10_000
+
+# Thin every state's monthly lines to about this many points with LTTB,
+# except for the highlighted states. None keeps every month.
+DOWNSAMPLE_POINTS = None
+
+
+@instrumented(st.cache_resource)
+def load_data(data_source, stream_rows=None) -> DatasetHandle:
+    if stream_rows:
+        # Only the cube is kept: each chunk of orders is folded in and dropped.
+        chunks = SourceChunks(data_source, stream_rows, parse_dates=["Order Date"])
+        cube = OrderCube.from_chunks(normalize_orders(chunk) for chunk in chunks)
+        return dataset_handle("superstore_cube", cube, chunks.sha256)
+
+    orders = normalize_orders(read_snapshot(data_source, parse_dates=["Order Date"]))
+    return dataset_handle(
+        "superstore_cube",
+        OrderCube.from_orders(orders),
+        snapshot_fingerprint(data_source, parse_dates=["Order Date"]),
     )
 
-    return profit_ratio_vs_sales.assign(
-        Profit_Ratio=profit_ratio_vs_sales["Profit"] / profit_ratio_vs_sales["Sales"]
-    )
+
+@instrumented(bounded_cache(priority=AGGREGATE, hash_funcs=HASH_FUNCS))
+def transform_data(cube_handle: DatasetHandle) -> DatasetHandle:
+    return cube_handle.derive("state", rollup_state(cube_handle.data.data))
 
 
 colors = {
@@ -62,72 +108,140 @@ colors = {
     "bar_other": "#C0D3D9",
 }
 
-try:
-    points = st.session_state.points["selection"]["points"]
+# A selection only affects the charts downstream of it, so each chart is a
+# fragment and a click reruns the clicked chart and its dependents only.
+RERUN_ON_SELECT = {
+    "points": ["points", "bars", "lines", "subcategory"],
+    "bars": ["bars", "lines", "subcategory"],
+    "lines": ["lines", "subcategory"],
+}
+
+
+def rerun_from(chart, cube_handle):
+    charts = RERUN_ON_SELECT[chart]
+    if HIGHLIGHT_IN_BROWSER:
+        charts = [x for x in charts if x != "points"]
+
+    def rerun():
+        # A new selection upstream drops the ones made in the charts below it,
+        # which no longer show the data they were made on.
+        for downstream in RERUN_ON_SELECT[chart][1:]:
+            st.session_state.pop(downstream, None)
+        # The charts about to rerun get their figures built here, independent
+        # ones in parallel, so that the fragments only read them from the cache.
+        build_figures(cube_handle, charts)
+        st.rerun([*charts, METRICS_FRAGMENT])
+
+    return rerun
+
+
+def selected_points(chart):
+    event = st.session_state.get(chart)
+    return event["selection"]["points"] if event else []
+
+
+def selected_state():
+    points = selected_points("points")
     if points:
-        st.session_state.state = points[0]["customdata"][0]
+        st.session_state.state = points[0]["customdata"]
+    return st.session_state.state
 
-    bars = st.session_state.bars["selection"]["points"]
+
+def selected_bar():
+    bars = selected_points("bars")
     if bars:
-        bar_state = bars[0]["y"]
-        bar_num = bars[0]["point_number"]
+        return bars[0]["y"], bars[0]["point_number"]
+    return selected_state(), -1
+
+
+def selected_month(bar_num):
+    lines = selected_points("lines")
+    if not lines:
+        return None, None, bar_num
+    x_date = datetime.datetime.strptime(lines[0]["x"], "%Y-%m-%d")
+    if MERGE_LINE_TRACES:
+        state_number = lines[0]["customdata"]
     else:
-        bar_state = st.session_state.state
-        bar_num = 15
-
-    lines = st.session_state.lines["selection"]["points"]
-    if lines:
-        x_date = datetime.datetime.strptime(lines[0]["x"], "%Y-%m-%d")
-        year = x_date.year
-        month = x_date.month
         state_number = lines[0]["curve_number"]
-    else:
-        year = None
-        month = None
-        state_number = bar_num
-except AttributeError:
-    bar_state = st.session_state.state
-    bar_num = 15
-    year = None
-    month = None
-    state_number = bar_num
-
-
-@st.cache_data
+    return x_date.year, x_date.month, state_number
+
+
+def reference_box_bounds(profit_ratio_vs_sales):
+    # The 25th and 75th percentiles of both measures.
+    return (
+        profit_ratio_vs_sales["Sales"].quantile(0.25),
+        profit_ratio_vs_sales["Sales"].quantile(0.75),
+        profit_ratio_vs_sales["Profit_Ratio"].quantile(0.25),
+        profit_ratio_vs_sales["Profit_Ratio"].quantile(0.75),
+    )
+
+
+@instrumented(bounded_cache(priority=AGGREGATE, hash_funcs=HASH_FUNCS))
+def reference_box(profit_handle: DatasetHandle) -> DatasetHandle:
+    profit_ratio_vs_sales = profit_handle.data
+    x0, x1, y0, y1 = reference_box_bounds(profit_ratio_vs_sales)
+    profit_ratio_vs_sales_filtered = profit_ratio_vs_sales.query(
+        "Sales>=@x0 and Sales<=@x1 and Profit_Ratio>=@y0 and Profit_Ratio<=@y1"
+    )
+    return profit_handle.derive("reference_box", profit_ratio_vs_sales_filtered)
+
+
+@instrumented(bounded_cache(priority=FIGURE, hash_funcs=HASH_FUNCS))
 def plot_profit_ratio_vs_sales(
-    profit_ratio_vs_sales: pd.DataFrame,
+    profit_handle: DatasetHandle,
     state: str,
+    highlight_in_browser: bool = False,
 ):
-    x0 = profit_ratio_vs_sales["Sales"].quantile(0.25)
-    x1 = profit_ratio_vs_sales["Sales"].quantile(0.75)
-    y0 = profit_ratio_vs_sales["Profit_Ratio"].quantile(0.25)
-    y1 = profit_ratio_vs_sales["Profit_Ratio"].quantile(0.75)
+    profit_ratio_vs_sales = profit_handle.data
+    x0, x1, y0, y1 = reference_box_bounds(profit_ratio_vs_sales)
+
+    if highlight_in_browser:
+        # Only the initial selection depends on the state; a click moves it
+        # in the browser, so the subtitle cannot name the state.
+        highlight = dict(
+            marker=dict(
+                color=colors["not_selected"],
+                line_color=colors["selected"],
+                size=6,
+            ),
+            selectedpoints=[profit_ratio_vs_sales.index.get_loc(state)],
+            selected=dict(marker=dict(color=colors["selected"], size=10)),
+            unselected=dict(marker=dict(opacity=1)),
+        )
+        subtitle_state = "Selected state"
+    else:
+        highlight = dict(
+            marker=dict(
+                color=[
+                    colors["selected"] if x == state else colors["not_selected"]
+                    for x in profit_ratio_vs_sales.index
+                ],
+                line_color=colors["selected"],
+                size=[10 if x == state else 6 for x in profit_ratio_vs_sales.index],
+            ),
+        )
+        subtitle_state = state
 
     fig = go.Figure()
 
     fig.add_traces(
         [
             go.Scatter(
+                **highlight,
                 mode="markers",
                 x=profit_ratio_vs_sales["Sales"],
                 y=profit_ratio_vs_sales["Profit_Ratio"],
-                customdata=profit_ratio_vs_sales.reset_index(),
+                # Only the state name travels as customdata (it is also what a
+                # point selection reads back); the measures are the x/y values.
+                customdata=profit_ratio_vs_sales.index.astype(str),
                 hovertemplate=(
-                    "<b>%{customdata[0]}</b><br><br>"
-                    "<b>Profit Ratio:</b> %{customdata[3]:.0%}<br>"
-                    "<b>Sales:</b> $%{customdata[2]:.3s}<extra></extra>"
+                    "<b>%{customdata}</b><br><br>"
+                    "<b>Profit Ratio:</b> %{y:.0%}<br>"
+                    "<b>Sales:</b> $%{x:.3s}<extra></extra>"
                 ),
                 hoverlabel=dict(
                     bgcolor="white",
                 ),
-                marker=dict(
-                    color=[
-                        colors["selected"] if x == state else colors["not_selected"]
-                        for x in profit_ratio_vs_sales.index
-                    ],
-                    line_color=colors["selected"],
-                    size=[10 if x == state else 6 for x in profit_ratio_vs_sales.index],
-                ),
             )
         ]
     )
@@ -186,7 +300,7 @@ def plot_profit_ratio_vs_sales(
         title=dict(
             text="Profit Ratio vs Sales by State",
             subtitle=dict(
-                text=f"<b>{state}</b> vs Other States<br>Reference box shows 25th & 75th percentiles for each measures."
+                text=f"<b>{subtitle_state}</b> vs Other States<br>Reference box shows 25th & 75th percentiles for each measures."
             ),
             x=0,
             xref="paper",
@@ -194,24 +308,18 @@ def plot_profit_ratio_vs_sales(
         ),
     )
 
-    profit_ratio_vs_sales_filtered = profit_ratio_vs_sales.query(
-        "Sales>=@x0 and Sales<=@x1 and Profit_Ratio>=@y0 and Profit_Ratio<=@y1"
-    )
+    return figure_spec(fig)
 
-    return fig, profit_ratio_vs_sales_filtered
 
-
-@st.cache_data
-def plot_bar_chart(
-    profit_ratio_vs_sales: pd.DataFrame,
-    profit_ratio_vs_sales_filtered: pd.DataFrame,
+@instrumented(bounded_cache(priority=AGGREGATE, hash_funcs=HASH_FUNCS))
+def bar_data(
+    profit_handle: DatasetHandle,
+    profit_filtered_handle: DatasetHandle,
     state: str,
-):
-    fig = make_subplots(
-        rows=1,
-        cols=2,
-        shared_yaxes=True,
-    )
+) -> DatasetHandle:
+    # The reference box states by sales, then the selected state.
+    profit_ratio_vs_sales = profit_handle.data
+    profit_ratio_vs_sales_filtered = profit_filtered_handle.data
 
     sales_df = (
         profit_ratio_vs_sales_filtered["Sales"]
@@ -239,6 +347,18 @@ def plot_bar_chart(
         ],
         axis=0,
     )
+    return profit_filtered_handle.derive("bars", bar_df, state)
+
+
+@instrumented(bounded_cache(priority=FIGURE, hash_funcs=HASH_FUNCS))
+def plot_bar_chart(bar_handle: DatasetHandle, state: str):
+    bar_df = bar_handle.data
+
+    fig = make_subplots(
+        rows=1,
+        cols=2,
+        shared_yaxes=True,
+    )
 
     bar_colors = [
         colors["bar_other"] if x != state else colors["selected"]
@@ -255,11 +375,7 @@ def plot_bar_chart(
                 color=bar_colors,
             ),
             showlegend=False,
-            customdata=bar_df,
-            hovertemplate=(
-                "<b>%{customdata[0]}</b><br>"
-                "<b>Sales:</b> %{customdata[1]:$,}<extra></extra>"
-            ),
+            hovertemplate="<b>%{y}</b><br><b>Sales:</b> %{x:$,}<extra></extra>",
             hoverlabel=dict(
                 bgcolor="white",
             ),
@@ -278,11 +394,11 @@ def plot_bar_chart(
                 color=bar_colors,
             ),
             showlegend=False,
-            customdata=bar_df,
+            customdata=bar_df["Sales"].to_numpy(dtype=np.float64),
             hovertemplate=(
-                "<b>%{customdata[0]}</b><br>"
-                "<b>Sales:</b> %{customdata[1]:$,}<br>"
-                "<b>Profit Ratio:</b> %{customdata[2]:.0%}<extra></extra>"
+                "<b>%{y}</b><br>"
+                "<b>Sales:</b> %{customdata:$,}<br>"
+                "<b>Profit Ratio:</b> %{x:.0%}<extra></extra>"
             ),
             hoverlabel=dict(
                 bgcolor="white",
@@ -318,31 +434,30 @@ def plot_bar_chart(
         ),
     )
 
-    return fig, bar_df
+    return figure_spec(fig)
 
 
-@st.cache_data
-def plot_profit_ratio_vs_sales_year(data_df, bar_df, state):
-    profit_ratio_vs_sales_year = (
-        data_df.loc[:, ["State", "Profit"]]
-        .assign(
-            Sales=data_df["Sales"]
-            .str.replace(r",|\$", "", regex=True)
-            .astype(np.float64),
-            Order_Month=data_df["Order Date"]
-            .dt.to_period("M")
-            .apply(lambda x: x.to_timestamp()),
-        )
-        .groupby(["State", "Order_Month"])
-        .sum()
-    )
+@instrumented(bounded_cache(priority=AGGREGATE, hash_funcs=HASH_FUNCS))
+def transform_data_month(cube_handle: DatasetHandle) -> DatasetHandle:
+    return cube_handle.derive("state_month", rollup_state_month(cube_handle.data.data))
 
-    profit_ratio_vs_sales_year = profit_ratio_vs_sales_year.assign(
-        Profit_Ratio=profit_ratio_vs_sales_year["Profit"]
-        / profit_ratio_vs_sales_year["Sales"]
-    )
 
-    profit_ratio_vs_sales_year = profit_ratio_vs_sales_year.reset_index()
+@instrumented(bounded_cache(priority=FIGURE, hash_funcs=HASH_FUNCS))
+def plot_profit_ratio_vs_sales_year(
+    month_handle,
+    bar_handle,
+    state,
+    point_state,
+    merge_traces=False,
+    webgl_points=None,
+    downsample_points=None,
+):
+    profit_ratio_vs_sales_year = month_handle.data
+    bar_df = bar_handle.data
+    if downsample_points:
+        profit_ratio_vs_sales_year = downsample_states(
+            profit_ratio_vs_sales_year, downsample_points, keep={state, point_state}
+        )
 
     fig = make_subplots(
         rows=2,
@@ -351,8 +466,9 @@ def plot_profit_ratio_vs_sales_year(data_df, bar_df, state):
         vertical_spacing=0.05,
     )
 
-    sales_line = []
-    profit_ratio_line = []
+    state_rows = state_slices(profit_ratio_vs_sales_year)
+
+    line_styles = {}
     for x in bar_df["State"]:
         if x == state:
             color = colors["selected"]
@@ -362,17 +478,57 @@ def plot_profit_ratio_vs_sales_year(data_df, bar_df, state):
             color = colors["bar_other"]
             line_width = 1
             zorder = 0
-        if x == st.session_state.state:
+        if x == point_state:
             line_width = 3
+        line_styles[x] = (color, line_width, zorder)
+
+    line_groups = []
+    if merge_traces:
+        style_states = {}
+        for x, style in line_styles.items():
+            style_states.setdefault(style, []).append(x)
+
+        state_numbers = {x: i for i, x in enumerate(bar_df["State"])}
+        for style, states in style_states.items():
+            row_slices = [state_rows.get(x, slice(0, 0)) for x in states]
+            line_df = gapped_rows(
+                profit_ratio_vs_sales_year, row_slices, ["Sales", "Profit_Ratio"]
+            )
+            # Keep per-point payloads small: integer customdata is sent as a
+            # typed array and short date strings replace nanosecond ISO ones.
+            line_df = line_df.assign(
+                Order_Month=line_df["Order_Month"].dt.strftime("%Y-%m-%d"),
+                State_Number=line_df["State"].map(state_numbers).astype(np.int8),
+            )
+            trace_args = dict(
+                customdata=line_df["State_Number"],
+                text=line_df["State"].astype(str),
+            )
+            line_groups.append((style, line_df, trace_args, "%{text}"))
+    else:
+        for x, style in line_styles.items():
+            line_df = profit_ratio_vs_sales_year.iloc[state_rows.get(x, slice(0, 0))]
+            line_groups.append((style, line_df, dict(name=x, meta=[x]), "%{meta[0]}"))
+
+    # Each group is drawn once per subplot.
+    points = 2 * sum(len(line_df) for _, line_df, _, _ in line_groups)
+    webgl = webgl_points is not None and points > webgl_points
+    if webgl and merge_traces:
+        # WebGL traces have no zorder and draw in trace order. Curve numbers
+        # only identify states when the traces are not merged.
+        line_groups.sort(key=lambda group: group[0][2])
+    scatter = go.Scattergl if webgl else go.Scatter
 
-        filtered_df = profit_ratio_vs_sales_year.query("State==@x")
-
+    sales_line = []
+    profit_ratio_line = []
+    for (color, line_width, zorder), line_df, trace_args, label in line_groups:
+        if not webgl:
+            trace_args = dict(trace_args, zorder=zorder)
         sales_line.append(
-            go.Scatter(
-                name=x,
-                meta=[x],
-                x=filtered_df["Order_Month"],
-                y=filtered_df["Sales"],
+            scatter(
+                **trace_args,
+                x=line_df["Order_Month"],
+                y=line_df["Sales"],
                 mode="lines+markers",
                 line=dict(
                     color=color,
@@ -380,8 +536,7 @@ def plot_profit_ratio_vs_sales_year(data_df, bar_df, state):
                 ),
                 marker_size=line_width,
                 showlegend=False,
-                zorder=zorder,
-                hovertemplate="<b>%{meta[0]}</b><br><b>%{x|%B %Y}</b><br>Sales: <b>%{y:$,}</b><extra></extra>",
+                hovertemplate=f"<b>{label}</b><br><b>%{{x|%B %Y}}</b><br>Sales: <b>%{{y:$,}}</b><extra></extra>",
                 hoverlabel=dict(
                     bgcolor="white",
                 ),
@@ -389,11 +544,10 @@ def plot_profit_ratio_vs_sales_year(data_df, bar_df, state):
         )
 
         profit_ratio_line.append(
-            go.Scatter(
-                name=x,
-                meta=[x],
-                x=filtered_df["Order_Month"],
-                y=filtered_df["Profit_Ratio"],
+            scatter(
+                **trace_args,
+                x=line_df["Order_Month"],
+                y=line_df["Profit_Ratio"],
                 mode="lines+markers",
                 line=dict(
                     color=color,
@@ -401,8 +555,7 @@ def plot_profit_ratio_vs_sales_year(data_df, bar_df, state):
                 ),
                 marker_size=line_width,
                 showlegend=False,
-                zorder=zorder,
-                hovertemplate="<b>%{meta[0]}</b><br><b>%{x|%B %Y}</b><br>Sales: <b>%{y:.0%}</b><extra></extra>",
+                hovertemplate=f"<b>{label}</b><br><b>%{{x|%B %Y}}</b><br>Sales: <b>%{{y:.0%}}</b><extra></extra>",
                 hoverlabel=dict(
                     bgcolor="white",
                 ),
@@ -454,36 +607,20 @@ def plot_profit_ratio_vs_sales_year(data_df, bar_df, state):
         ),
     )
 
-    return fig
+    return figure_spec(fig)
 
 
-@st.cache_data
-def plot_subcategory_sales(data_df, bar_df, state_number, year=None, month=None):
-    data_state = data_df.loc[data_df["State"].isin(bar_df["State"]), :]
-    state = bar_df["State"].iloc[
-        state_number if state_number < 16 else state_number - 16
-    ]
-    if year is not None:
-        data_state = data_state.loc[
-            (data_state["Order Date"].dt.year == year)
-            & (data_state["Order Date"].dt.month == month),
-            :,
-        ]
-
-    data_subcategory = (
-        data_state.loc[:, ["State", "Profit", "Sub-Category"]]
-        .assign(
-            Sales=data_state["Sales"]
-            .str.replace(r",|\$", "", regex=True)
-            .astype(np.float64)
-        )
-        .groupby(["State", "Sub-Category"])
-        .sum()
-    )
+@instrumented(bounded_cache(priority=FIGURE, hash_funcs=HASH_FUNCS))
+def plot_subcategory_sales(
+    cube_handle, bar_handle, state_number, year=None, month=None
+):
+    cube = cube_handle.data
+    bar_df = bar_handle.data
 
-    data_subcategory = data_subcategory.assign(
-        Profit_Ratio=data_subcategory["Profit"] / data_subcategory["Sales"]
-    )
+    # One Sales and one Profit Ratio line per bar, so curve numbers wrap
+    # around the bar count; -1 is the selected state, always the last bar.
+    state = bar_df["State"].iloc[state_number % len(bar_df)]
+    data_subcategory = rollup_subcategory(cube, bar_df["State"], year, month)
 
     max_profit_ratio, min_profit_ratio = (
         data_subcategory["Profit_Ratio"].max(),
@@ -559,39 +696,117 @@ def plot_subcategory_sales(data_df, bar_df, state_number, year=None, month=None)
         plot_bgcolor="white",
     )
 
-    return fig
+    return figure_spec(fig)
 
 
-data_df = load_data()
-profit_ratio_vs_sales = transform_data(data_df)
-fig_1, profit_ratio_vs_sales_filtered = plot_profit_ratio_vs_sales(
-    profit_ratio_vs_sales, st.session_state.state
-)
-fig_2, bar_df = plot_bar_chart(
-    profit_ratio_vs_sales, profit_ratio_vs_sales_filtered, st.session_state.state
-)
-fig_3 = plot_profit_ratio_vs_sales_year(data_df, bar_df, bar_state)
-fig_4 = plot_subcategory_sales(
-    data_df,
-    bar_df,
-    state_number,
-    year,
-    month,
+def figure_tasks(cube_handle, state, bar_state, state_number, year, month):
+    """The page's pipeline, from the cube to each chart's figure."""
+    return {
+        "profit": Task(transform_data, cube_handle),
+        "month": Task(transform_data_month, cube_handle),
+        "reference_box": Task(reference_box, Ref("profit")),
+        "bar": Task(bar_data, Ref("profit"), Ref("reference_box"), state),
+        "points": Task(
+            plot_profit_ratio_vs_sales, Ref("profit"), state, HIGHLIGHT_IN_BROWSER
+        ),
+        "bars": Task(plot_bar_chart, Ref("bar"), state),
+        "lines": Task(
+            plot_profit_ratio_vs_sales_year,
+            Ref("month"),
+            Ref("bar"),
+            bar_state,
+            state,
+            MERGE_LINE_TRACES,
+            WEBGL_POINTS,
+            DOWNSAMPLE_POINTS,
+        ),
+        "subcategory": Task(
+            plot_subcategory_sales, cube_handle, Ref("bar"), state_number, year, month
+        ),
+    }
+
+
+def selected_figure_tasks(cube_handle):
+    state = selected_state()
+    bar_state, bar_num = selected_bar()
+    year, month, state_number = selected_month(bar_num)
+    return figure_tasks(cube_handle, state, bar_state, state_number, year, month)
+
+
+def build_figures(cube_handle, charts):
+    """Build the figures of ``charts`` from the current selections, in parallel."""
+    run_dag(selected_figure_tasks(cube_handle), charts, name="week_16.figures")
+
+
+def chart_figure(cube_handle, chart):
+    # The figure was built by build_figures, on a full run or in the callback
+    # of the click that reruns this chart, so the graph only hits the cache and
+    # runs in the script thread without a pool.
+    run = run_dag(selected_figure_tasks(cube_handle), [chart], workers=1)
+    return run.results[chart]
+
+
+# Every chart reads its figure through figure_tasks from the current
+# selections, so that a fragment rerun sees the selections its upstream charts
+# left and the charts share one wiring of the stages.
+@st.fragment(key="points")
+def points_chart(cube_handle):
+    with timed("week_16.plotly_chart"):
+        plotly_chart(
+            chart_figure(cube_handle, "points"),
+            theme=None,
+            key="points",
+            on_select=rerun_from("points", cube_handle),
+            selection_mode="points",
+        )
+
+
+@st.fragment(key="bars")
+def bars_chart(cube_handle):
+    with timed("week_16.plotly_chart"):
+        plotly_chart(
+            chart_figure(cube_handle, "bars"),
+            theme=None,
+            key="bars",
+            on_select=rerun_from("bars", cube_handle),
+            selection_mode="points",
+        )
+
+
+@st.fragment(key="lines")
+def lines_chart(cube_handle):
+    with timed("week_16.plotly_chart"):
+        plotly_chart(
+            chart_figure(cube_handle, "lines"),
+            theme=None,
+            key="lines",
+            on_select=rerun_from("lines", cube_handle),
+            selection_mode="points",
+        )
+
+
+@st.fragment(key="subcategory")
+def subcategory_chart(cube_handle):
+    with timed("week_16.plotly_chart"):
+        plotly_chart(chart_figure(cube_handle, "subcategory"), theme=None)
+
+
+cube_handle = load_data(
+    configured_source("superstore_orders", DATA_SOURCE), STREAM_ROWS
 )
 
+# A full run builds the four figures up front, independent ones in parallel;
+# the charts below then find theirs in the cache.
+build_figures(cube_handle, ["points", "bars", "lines", "subcategory"])
 
 col1, col2 = st.columns([1, 1])
 
 with col1:
-    st.plotly_chart(
-        fig_1, theme=None, key="points", on_select="rerun", selection_mode="points"
-    )
-    st.plotly_chart(
-        fig_2, theme=None, key="bars", on_select="rerun", selection_mode="points"
-    )
+    points_chart(cube_handle)
+    bars_chart(cube_handle)
 
 with col2:
-    st.plotly_chart(
-        fig_3, theme=None, key="lines", on_select="rerun", selection_mode="points"
-    )
-    st.plotly_chart(fig_4, theme=None)
+    lines_chart(cube_handle)
+    subcategory_chart(cube_handle)
+
+metrics_panel()